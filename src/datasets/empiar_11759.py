@@ -2,33 +2,26 @@ import ftplib
 import sys
 import os
 
-from utils.helpers import download_ftp_files
+from utils.ftp_sync import sync_ftp_directory
 from timeit import default_timer as timer
 from utils.metadata import extract_dm3_metadata
 
 FTP_HOST = "ftp.ebi.ac.uk"
 FTP_PATH = "/empiar/world_availability/11759/data/"
 SAVE_PATH = "data/raw/empiar_11759_dataset"
+LISTING_CACHE_FILE = "data/cache/ftp/empiar_11759_listing.json"
 
 METADATA_FOLDER = "outputs/empiar_11759_metadata"
 
 def download_dataset():
-    """Downloads the EMPIAR 11759 (Developing retina in zebrafish 55 hpf larval eye) dataset."""
-    if os.path.exists(SAVE_PATH):
-        print(f"\nDataset already exists at {SAVE_PATH}. Skipping download.")
-    else:
-        print(f"\nDataset not found at {SAVE_PATH}. Proceeding with download...")
-        try:
-            with ftplib.FTP(FTP_HOST) as ftp:
-                print(f"Connected to FTP server: {FTP_HOST}")
-                ftp.login() # No username/password needed for anonymous login for public FTPs
-                ftp.encoding = "utf-8" # Ensure correct encoding for filenames
-                download_ftp_files(ftp, FTP_PATH, SAVE_PATH)
-
-        except ftplib.all_errors as e:
-            print(f"FTP Error: {e}", file=sys.stderr)
-        except Exception as e:
-            print(f"An unexpected error occurred: {e}", file=sys.stderr)
+    """Downloads the EMPIAR 11759 (Developing retina in zebrafish 55 hpf larval eye) dataset.
+    Only files that are new or changed since the last sync are transferred."""
+    try:
+        sync_ftp_directory(FTP_HOST, FTP_PATH, SAVE_PATH, LISTING_CACHE_FILE)
+    except ftplib.all_errors as e:
+        print(f"FTP Error: {e}", file=sys.stderr)
+    except Exception as e:
+        print(f"An unexpected error occurred: {e}", file=sys.stderr)
 
 def extract_metadata():
     """Extracts metadata from the downloaded DM3 files in the dataset."""
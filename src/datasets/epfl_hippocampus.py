@@ -1,9 +1,11 @@
 from utils.helpers import download_file
 from utils.metadata import extract_tif_metadata
+from utils.compression import benchmark_compression
 
 DATASET_URL = "https://documents.epfl.ch/groups/c/cv/cvlab-unit/www/data/%20ElectronMicroscopy_Hippocampus/volumedata.tif"
 SAVE_PATH = "data/raw/epfl_volumedata.tif"
 METADATA_FILE = "outputs/epfl_hippocampus_tif_metadata.json"
+COMPRESSION_REPORT_FILE = "reports/compression/epfl_hippocampus_tif_compression.json"
 
 def download_dataset():
     """Downloads the EPFL Electron Microscopy Hippocampus dataset."""
@@ -13,7 +15,12 @@ def extract_metadata():
     """Extracts metadata from the downloaded TIFF file and saves it to a JSON file."""
     extract_tif_metadata(SAVE_PATH, METADATA_FILE)
 
+def evaluate_compression():
+    """Benchmarks compression codecs on blocks sampled from the downloaded TIFF file."""
+    benchmark_compression(SAVE_PATH, COMPRESSION_REPORT_FILE)
+
 def run_tasks():
-    """Runs the download and metadata extraction tasks."""
+    """Runs the download, metadata extraction and compression evaluation tasks."""
     download_dataset()
-    extract_metadata()
\ No newline at end of file
+    extract_metadata()
+    evaluate_compression()
\ No newline at end of file
@@ -4,11 +4,18 @@ import os
 from cloudvolume import CloudVolume
 from timeit import default_timer as timer
 from utils.metadata import extract_zarr_metadata
+from utils.compression import benchmark_compression
+from utils.occupancy import build_occupancy_index
+from utils.remote_store import PrecomputedVolumeDataset
+from utils.volume_dataset import ZarrVolumeDataset
 
 DATASET_URL = "gs://neuroglancer-janelia-flyem-hemibrain/v1.0/segmentation/"
 
 SAVE_PATH = "data/raw/hemibrain_1000x1000x1000_crop.zarr/"
 METADATA_FILE = "outputs/hemibrain_ng_zarr_metadata.json"
+REMOTE_CACHE_PATH = "data/cache/hemibrain_ng"
+COMPRESSION_REPORT_FILE = "reports/compression/hemibrain_ng_zarr_compression.json"
+OCCUPANCY_INDEX_FILE = "data/index/hemibrain_ng_occupancy.npz"
 
 def download_dataset():
     """Downloads a 1000x1000x1000 pixel crop of the Hemibrain Neuroglancer dataset."""
@@ -49,7 +56,25 @@ def extract_metadata():
     """Extracts metadata from the downloaded Zarr container and saves it to a JSON file."""
     extract_zarr_metadata(SAVE_PATH, METADATA_FILE)
 
+def open_remote_volume() -> PrecomputedVolumeDataset:
+    """Opens the Hemibrain Neuroglancer segmentation directly, without downloading a crop.
+    Chunks are fetched on demand and kept in a local disk cache."""
+    return PrecomputedVolumeDataset(DATASET_URL, REMOTE_CACHE_PATH)
+
+def evaluate_compression():
+    """Benchmarks compression codecs on chunks sampled from the downloaded Zarr container."""
+    benchmark_compression(SAVE_PATH, COMPRESSION_REPORT_FILE)
+
+def index_occupancy():
+    """Builds the chunk occupancy index (foreground fraction and label IDs per chunk) of the segmentation crop."""
+    try:
+        build_occupancy_index(ZarrVolumeDataset(SAVE_PATH), OCCUPANCY_INDEX_FILE)
+    except Exception as e:
+        print(f"\nError indexing occupancy of {SAVE_PATH}: {e}")
+
 def run_tasks():
-    """Runs the download and metadata extraction tasks."""
+    """Runs the download, metadata extraction, compression evaluation and occupancy indexing tasks."""
     download_dataset()
-    extract_metadata()
\ No newline at end of file
+    extract_metadata()
+    evaluate_compression()
+    index_occupancy()
\ No newline at end of file
@@ -3,12 +3,20 @@ import quilt3 as q3
 
 from timeit import default_timer as timer
 from utils.metadata import extract_zarr_metadata
+from utils.compression import benchmark_compression
+from utils.occupancy import build_occupancy_index
+from utils.remote_store import open_remote_zarr
+from utils.volume_dataset import ZarrVolumeDataset
 
 BUCKET_ROOT = "s3://janelia-cosem-datasets"
 BUCKET_PATH = "jrc_mus-nacc-2/jrc_mus-nacc-2.zarr/recon-2/em/fibsem-int16/"
 
 SAVE_PATH = "data/raw/jrc_mus_nacc_2.zarr/"
+ARRAY_PATH = "s0"  # Full-resolution level of the multiscale group
 METADATA_FILE = "outputs/jrc_mus_nacc_zarr_metadata.json"
+REMOTE_CACHE_PATH = "data/cache/jrc_mus_nacc_2"
+COMPRESSION_REPORT_FILE = "reports/compression/jrc_mus_nacc_zarr_compression.json"
+OCCUPANCY_INDEX_FILE = "data/index/jrc_mus_nacc_2_occupancy.npz"
 
 def download_dataset():
     """Downloads the Janelia Mouse nucleus accumbens (JRC-MUS-NACC) dataset."""
@@ -33,7 +41,26 @@ def extract_metadata():
     """Extracts metadata from the downloaded Zarr container and saves it to a JSON file."""
     extract_zarr_metadata(SAVE_PATH, METADATA_FILE)
 
+def open_remote_volume() -> ZarrVolumeDataset:
+    """Opens the JRC-MUS-NACC Zarr container directly on S3, without downloading it.
+    Chunks are fetched on demand and kept in a local disk cache."""
+    return open_remote_zarr(f"{BUCKET_ROOT}/{BUCKET_PATH}", REMOTE_CACHE_PATH,
+                            array_path=ARRAY_PATH, storage_options={"anon": True})
+
+def evaluate_compression():
+    """Benchmarks compression codecs on chunks sampled from the downloaded Zarr container."""
+    benchmark_compression(SAVE_PATH, COMPRESSION_REPORT_FILE)
+
+def index_occupancy():
+    """Builds the chunk occupancy index of the full-resolution array, so samplers can skip empty chunks."""
+    try:
+        build_occupancy_index(ZarrVolumeDataset(SAVE_PATH, ARRAY_PATH), OCCUPANCY_INDEX_FILE)
+    except Exception as e:
+        print(f"\nError indexing occupancy of {SAVE_PATH}{ARRAY_PATH}: {e}")
+
 def run_tasks():
-    """Runs the download and metadata extraction tasks."""
+    """Runs the download, metadata extraction, compression evaluation and occupancy indexing tasks."""
     download_dataset()
-    extract_metadata()
\ No newline at end of file
+    extract_metadata()
+    evaluate_compression()
+    index_occupancy()
\ No newline at end of file
@@ -1,49 +1,35 @@
 import ftplib
 import sys
 import os
-import fnmatch
 
 from timeit import default_timer as timer
+from utils.ftp_sync import sync_ftp_directory
 from utils.metadata import extract_tif_metadata
+from utils.compression import benchmark_compression
 
 FTP_HOST = "ftp.ebi.ac.uk"
 FTP_PATH = "/pub/databases/IDR/idr0086-miron-micrographs/20200610-ftp/experimentD/Miron_FIB-SEM/Miron_FIB-SEM_processed"
 FTP_FILE_PATTERN = "Figure_S3B_FIB-SEM_U2OS_*.tif"
 
 SAVE_PATH = "data/raw/u2os_chromatin"
+LISTING_CACHE_FILE = "data/cache/ftp/u2os_chromatin_listing.json"
 METADATA_FOLDER = "outputs/u2os_chromatin_metadata"
+PAGE_INDEX_FOLDER = "data/index/u2os_chromatin"
+COMPRESSION_REPORT_FOLDER = "reports/compression/u2os_chromatin"
 
 def download_dataset():
-    """Downloads the U2OS Chromatin dataset images and saves them as TIFF files."""
-    if os.path.exists(SAVE_PATH):
-        print(f"\nDataset already exists at {SAVE_PATH}. Skipping download.")
-    else:
-        print(f"\nDataset not found at {SAVE_PATH}. Proceeding with download...")
-        os.makedirs(SAVE_PATH, exist_ok=True)
-        start_time = timer()
-
-        try:
-            with ftplib.FTP(FTP_HOST) as ftp:
-                print(f"Connected to FTP server: {FTP_HOST}")
-                ftp.login() # No username/password needed for anonymous login for public FTPs
-                ftp.encoding = "utf-8" # Ensure correct encoding for filenames
-                # Change directory within the FTP server
-                ftp.cwd(FTP_PATH)
+    """Downloads the U2OS Chromatin dataset images and saves them as TIFF files.
+    Only files that are new or changed since the last sync are transferred."""
+    try:
+        sync_ftp_directory(FTP_HOST, FTP_PATH, SAVE_PATH, LISTING_CACHE_FILE, file_pattern=FTP_FILE_PATTERN)
+    except ftplib.all_errors as e:
+        print(f"FTP Error: {e}", file=sys.stderr)
+    except Exception as e:
+        print(f"Unexpected error occurred: {e}", file=sys.stderr)
 
-                # Filter files based on the pattern
-                matching_files = fnmatch.filter(ftp.nlst(), FTP_FILE_PATTERN)
-                for filename in matching_files:
-                    local_filepath = os.path.join(SAVE_PATH, filename)
-                    with open(local_filepath, "wb") as local_file:
-                        ftp.retrbinary(f"RETR {filename}", local_file.write)
-
-        except ftplib.all_errors as e:
-            print(f"FTP Error: {e}", file=sys.stderr)
-        except Exception as e:
-            print(f"Unexpected error occurred: {e}", file=sys.stderr)
-
-        end_time = timer()
-        print(f"Download completed in {(end_time - start_time):.2f} seconds.")
+def get_page_index_path(file_name: str) -> str:
+    """Returns the path of the saved page index of a downloaded TIFF file."""
+    return os.path.join(PAGE_INDEX_FOLDER, f"{file_name.replace('.', '_')}_pages.npz")
 
 def extract_metadata():
     """Extracts metadata from the downloaded TIFF files in the dataset."""
@@ -58,13 +44,26 @@ def extract_metadata():
             for file_name in files:
                 output_filename = file_name.replace(".", "_")
                 metadata_file_name = os.path.join(METADATA_FOLDER, f"{output_filename}_metadata.json")
-                
-                extract_tif_metadata(os.path.join(root, file_name), metadata_file_name)
+                page_index_file_name = get_page_index_path(file_name)
+
+                # The stacks hold thousands of identical pages, so only pages whose tags differ are parsed
+                extract_tif_metadata(os.path.join(root, file_name), metadata_file_name,
+                                     fast_scan=True, index_path=page_index_file_name)
         
         end_time = timer()
         print(f"Metadata extraction completed in {(end_time - start_time):.2f} seconds.")
 
+def evaluate_compression():
+    """Benchmarks compression codecs on blocks sampled from each downloaded TIFF file."""
+    for root, _, files in os.walk(SAVE_PATH):
+        for file_name in files:
+            output_filename = file_name.replace(".", "_")
+            report_file_name = os.path.join(COMPRESSION_REPORT_FOLDER, f"{output_filename}_compression.json")
+
+            benchmark_compression(os.path.join(root, file_name), report_file_name)
+
 def run_tasks():
-    """Runs the download and metadata extraction tasks."""
+    """Runs the download, metadata extraction and compression evaluation tasks."""
     download_dataset()
-    extract_metadata()
\ No newline at end of file
+    extract_metadata()
+    evaluate_compression()
\ No newline at end of file
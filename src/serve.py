@@ -0,0 +1,37 @@
+import os
+
+from datasets import epfl_hippocampus, hemibrain_ng, jrc_mus_nacc, u2os_chromatin
+from utils.chunk_server import serve_volumes
+from utils.volume_dataset import TiffVolumeDataset, ZarrVolumeDataset
+
+def register_local_volumes() -> dict:
+    """Opens every dataset volume available locally, keyed by the name it is served under.
+
+    Returns:
+        dict: Maps volume names to VolumeDataset objects.
+    """
+    volumes = {}
+    if os.path.exists(epfl_hippocampus.SAVE_PATH):
+        volumes["epfl_hippocampus"] = TiffVolumeDataset(epfl_hippocampus.SAVE_PATH)
+    if os.path.exists(hemibrain_ng.SAVE_PATH):
+        volumes["hemibrain_ng"] = ZarrVolumeDataset(hemibrain_ng.SAVE_PATH)
+    if os.path.exists(jrc_mus_nacc.SAVE_PATH):
+        volumes["jrc_mus_nacc"] = ZarrVolumeDataset(jrc_mus_nacc.SAVE_PATH, jrc_mus_nacc.ARRAY_PATH)
+    if os.path.exists(u2os_chromatin.SAVE_PATH):
+        for file_name in sorted(os.listdir(u2os_chromatin.SAVE_PATH)):
+            volume_name = f"u2os_chromatin_{os.path.splitext(file_name)[0]}"
+            volumes[volume_name] = TiffVolumeDataset(os.path.join(u2os_chromatin.SAVE_PATH, file_name),
+                                                     u2os_chromatin.get_page_index_path(file_name))
+    return volumes
+
+def main():
+    volumes = register_local_volumes()
+    if not volumes:
+        print("No local volumes found. Run 'python3 src/main.py' or 'dvc pull' first.")
+        return
+    for volume_name in volumes:
+        print(f"Registered volume: {volume_name}")
+    serve_volumes(volumes)
+
+if __name__ == "__main__":
+    main()
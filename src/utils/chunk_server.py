@@ -0,0 +1,338 @@
+import asyncio
+import itertools
+import json
+import os
+import sys
+import numpy as np
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from utils.volume_dataset import VolumeDataset
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_CACHE_BYTES = 2 * 1024**3  # Shared decoded-chunk cache size (2 GiB)
+KEEP_ALIVE_TIMEOUT = 30  # Seconds an idle keep-alive connection is kept open
+MAX_DECODE_WORKERS = os.cpu_count() or 4  # Threads decoding chunks in the background
+MAX_BLOCK_BYTES = 512 * 1024**2  # Largest block a single request may ask for (512 MiB)
+WRITE_SLICE_BYTES = 4 * 1024**2  # Response bodies are written in slices, so large ones do not stall other clients
+
+class ChunkCache:
+    """LRU cache of decoded chunks shared by every client of the server, bounded by total bytes.
+    Concurrent requests for a chunk that is still being decoded wait for the same decode.
+    Must only be used from the event loop thread.
+    """
+
+    def __init__(self, max_bytes: int, executor: ThreadPoolExecutor):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._executor = executor
+        self._chunks = OrderedDict()
+        self._pending = {}
+
+    async def get(self, key: tuple, load: callable) -> np.ndarray:
+        """Returns the cached chunk for `key`, decoding it with `load` in a worker thread on a miss.
+
+        Args:
+            key (tuple): A hashable chunk identifier, e.g. (volume name, chunk index).
+            load (callable): Reads and decodes the chunk.
+
+        Returns:
+            np.ndarray: The decoded chunk. Callers must not modify it.
+        """
+        if key in self._chunks:
+            self.hits += 1
+            self._chunks.move_to_end(key)
+            return self._chunks[key]
+
+        if key not in self._pending:
+            self.misses += 1
+            self._pending[key] = asyncio.get_running_loop().run_in_executor(self._executor, load)
+            self._pending[key].add_done_callback(lambda future: self._store(key, future))
+        # Shielded so a client disconnecting does not cancel a decode other clients wait for
+        return await asyncio.shield(self._pending[key])
+
+    def stats(self) -> dict:
+        """Returns the cache usage counters."""
+        return {
+            "max_bytes": self.max_bytes,
+            "current_bytes": self.current_bytes,
+            "cached_chunks": len(self._chunks),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def _store(self, key: tuple, future: asyncio.Future) -> None:
+        """Moves a finished decode into the cache, evicting least recently used chunks."""
+        del self._pending[key]
+        if future.cancelled() or future.exception() is not None:
+            return
+        chunk = future.result()
+        chunk.flags.writeable = False
+        if chunk.nbytes > self.max_bytes:
+            return
+        self._chunks[key] = chunk
+        self.current_bytes += chunk.nbytes
+        while self.current_bytes > self.max_bytes:
+            _, evicted = self._chunks.popitem(last=False)
+            self.current_bytes -= evicted.nbytes
+
+class ChunkServer:
+    """Lightweight asyncio HTTP server exposing registered volumes to local clients.
+
+    Endpoints:
+        GET /volumes                                  -> JSON list of volume names
+        GET /stats                                    -> JSON cache counters
+        GET /volumes/<name>/metadata                  -> JSON volume metadata
+        GET /volumes/<name>/block?start=z,y,x&size=d,h,w -> raw C-order block bytes
+        GET /volumes/<name>/.zarray, .zattrs          -> Zarr v2 metadata (uncompressed)
+        GET /volumes/<name>/<i.j.k>                   -> raw Zarr v2 chunk bytes
+
+    The Zarr endpoints let any Zarr v2 HTTP store (e.g. zarr.storage.FSStore) read a volume directly.
+    """
+
+    def __init__(self, volumes: dict, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                 cache_bytes: int = DEFAULT_CACHE_BYTES, max_workers: int = MAX_DECODE_WORKERS,
+                 max_block_bytes: int = MAX_BLOCK_BYTES):
+        """
+        Args:
+            volumes (dict): Maps volume names to VolumeDataset objects.
+            host (str): The interface to bind to.
+            port (int): The port to bind to (0 picks a free port).
+            cache_bytes (int): The size of the shared decoded-chunk cache.
+            max_workers (int): The number of threads decoding chunks.
+            max_block_bytes (int): The largest block a request may ask for; larger ones get a 413.
+        """
+        self.volumes = volumes
+        self.max_block_bytes = max_block_bytes
+        self.host = host
+        self.port = port
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.cache = ChunkCache(cache_bytes, self._executor)
+        self._server = None
+
+    async def start(self) -> None:
+        """Starts listening for connections; `self.port` holds the bound port afterwards."""
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        print(f"Chunk server listening on http://{self.host}:{self.port} with {len(self.volumes)} volumes.")
+
+    async def stop(self) -> None:
+        """Stops accepting connections and shuts down the decode threads."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        self._executor.shutdown(wait=False)
+
+    def run(self) -> None:
+        """Starts the server and blocks until interrupted."""
+        async def serve():
+            await self.start()
+            try:
+                await self._server.serve_forever()
+            finally:
+                await self.stop()
+
+        try:
+            asyncio.run(serve())
+        except KeyboardInterrupt:
+            print("\nChunk server stopped.")
+
+    async def get_block(self, volume_name: str, start: tuple, block_size: tuple) -> np.ndarray:
+        """Assembles a block from (cached) chunks of a registered volume. The copy into the block
+        runs in a worker thread, so large blocks do not stall the event loop.
+
+        Args:
+            volume_name (str): The registered volume name.
+            start (tuple): The block origin, in array axis order.
+            block_size (tuple): The block size, in array axis order.
+
+        Returns:
+            np.ndarray: The block data.
+        """
+        volume = self.volumes[volume_name]
+        region = volume.block_region(start, block_size)
+        chunk_ranges = [range(r.start // c, (r.stop - 1) // c + 1) for r, c in zip(region, volume.chunk_shape)]
+        chunk_indices = list(itertools.product(*chunk_ranges))
+        chunks = await asyncio.gather(*(self._get_chunk(volume_name, index) for index in chunk_indices))
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, _assemble_block, volume, region, chunk_indices, chunks)
+
+    async def _get_chunk(self, volume_name: str, chunk_index: tuple) -> np.ndarray:
+        """Returns a decoded chunk of a registered volume through the shared cache."""
+        volume = self.volumes[volume_name]
+        return await self.cache.get((volume_name, chunk_index), lambda: volume.read_chunk(chunk_index))
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serves HTTP/1.1 requests on one connection until the client closes it or it goes idle."""
+        try:
+            while True:
+                try:
+                    request_line = await asyncio.wait_for(reader.readline(), KEEP_ALIVE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    break
+                if not request_line.strip():
+                    break
+
+                method, target, version = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    header_line = await reader.readline()
+                    if header_line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = header_line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                if "content-length" in headers:
+                    await reader.readexactly(int(headers["content-length"]))
+
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+
+                status, content_type, body, extra_headers = await self._respond(method, target)
+                response_headers = [
+                    f"HTTP/1.1 {status}",
+                    f"Content-Type: {content_type}",
+                    f"Content-Length: {len(body)}",
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}",
+                ] + [f"{name}: {value}" for name, value in extra_headers.items()]
+                writer.write(("\r\n".join(response_headers) + "\r\n\r\n").encode("latin-1"))
+                if method != "HEAD":
+                    body = memoryview(body)
+                    for offset in range(0, len(body), WRITE_SLICE_BYTES):
+                        writer.write(body[offset:offset + WRITE_SLICE_BYTES])
+                        await writer.drain()
+                await writer.drain()
+
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass  # Client went away or sent a malformed request line
+        finally:
+            writer.close()
+
+    async def _respond(self, method: str, target: str) -> tuple:
+        """Routes a request to an endpoint.
+
+        Returns:
+            tuple: (status line, content type, body bytes, extra headers dict).
+        """
+        if method not in ("GET", "HEAD"):
+            return _error_response("405 Method Not Allowed", f"Method {method} not supported.")
+
+        url = urlsplit(target)
+        parts = [unquote(part) for part in url.path.strip("/").split("/") if part]
+        try:
+            if parts == ["volumes"]:
+                return _json_response(sorted(self.volumes))
+            if parts == ["stats"]:
+                return _json_response(self.cache.stats())
+            if len(parts) != 3 or parts[0] != "volumes" or parts[1] not in self.volumes:
+                return _error_response("404 Not Found", f"No resource at {url.path}.")
+
+            volume_name, resource = parts[1], parts[2]
+            volume = self.volumes[volume_name]
+            if resource == "metadata":
+                return _json_response(volume.get_metadata())
+            if resource == "block":
+                query = parse_qs(url.query)
+                start = _parse_coordinates(query["start"][0])
+                block_size = _parse_coordinates(query["size"][0])
+                region = volume.block_region(start, block_size)
+                block_bytes = int(np.prod([r.stop - r.start for r in region])) * np.dtype(volume.dtype).itemsize
+                if block_bytes > self.max_block_bytes:
+                    return _error_response("413 Content Too Large",
+                                           f"Block of {block_bytes} bytes exceeds the {self.max_block_bytes} byte limit.")
+                block = await self.get_block(volume_name, start, block_size)
+                return ("200 OK", "application/octet-stream", _as_bytes(block), {
+                    "X-Block-Shape": ",".join(str(s) for s in block.shape),
+                    "X-Block-Dtype": block.dtype.str,
+                })
+            if resource == ".zarray":
+                return _json_response(_zarray_metadata(volume))
+            if resource == ".zattrs":
+                return _json_response({})
+            if resource.startswith("."):
+                return _error_response("404 Not Found", f"No resource at {url.path}.")
+
+            chunk_index = tuple(int(i) for i in resource.split("."))
+            if len(chunk_index) != len(volume.shape):
+                raise ValueError(f"Chunk key {resource} does not match volume shape {volume.shape}.")
+            grid_shape = tuple(-(-s // c) for s, c in zip(volume.shape, volume.chunk_shape))
+            if any(not 0 <= i < n for i, n in zip(chunk_index, grid_shape)):
+                # Out-of-grid keys are never decoded, so they cannot fill the shared cache
+                return _error_response("404 Not Found", f"Chunk {resource} is outside the chunk grid {grid_shape}.")
+            chunk = await self._get_chunk(volume_name, chunk_index)
+            body = await asyncio.get_running_loop().run_in_executor(
+                self._executor, lambda: _as_bytes(_pad_chunk(chunk, volume)))
+            return ("200 OK", "application/octet-stream", body, {})
+
+        except (KeyError, ValueError, IndexError) as e:
+            return _error_response("400 Bad Request", str(e))
+        except Exception as e:
+            print(f"Error serving {target}: {e}", file=sys.stderr)
+            return _error_response("500 Internal Server Error", str(e))
+
+def serve_volumes(volumes: dict, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                  cache_bytes: int = DEFAULT_CACHE_BYTES) -> None:
+    """Serves the given volumes over HTTP until interrupted.
+
+    Args:
+        volumes (dict): Maps volume names to VolumeDataset objects.
+        host (str): The interface to bind to.
+        port (int): The port to bind to.
+        cache_bytes (int): The size of the shared decoded-chunk cache.
+    """
+    ChunkServer(volumes, host, port, cache_bytes).run()
+
+def _json_response(content: object) -> tuple:
+    """Builds a 200 response with a JSON body."""
+    return ("200 OK", "application/json", json.dumps(content).encode("utf-8"), {})
+
+def _error_response(status: str, message: str) -> tuple:
+    """Builds an error response with a JSON body."""
+    return (status, "application/json", json.dumps({"error": message}).encode("utf-8"), {})
+
+def _parse_coordinates(value: str) -> tuple:
+    """Parses comma-separated integers such as '0,128,256'."""
+    return tuple(int(v) for v in value.split(","))
+
+def _zarray_metadata(volume: VolumeDataset) -> dict:
+    """Describes a volume as an uncompressed Zarr v2 array."""
+    return {
+        "zarr_format": 2,
+        "shape": list(volume.shape),
+        "chunks": list(volume.chunk_shape),
+        "dtype": np.dtype(volume.dtype).str,
+        "compressor": None,
+        "fill_value": volume.get_metadata()["fill_value"],
+        "order": "C",
+        "filters": None,
+    }
+
+def _assemble_block(volume: VolumeDataset, region: tuple, chunk_indices: list, chunks: list) -> np.ndarray:
+    """Copies the parts of decoded chunks that overlap a region into a new block."""
+    block = np.empty(tuple(r.stop - r.start for r in region), dtype=volume.dtype)
+    for chunk_index, chunk in zip(chunk_indices, chunks):
+        block_slices, chunk_slices = [], []
+        for i, c, r in zip(chunk_index, volume.chunk_shape, region):
+            low, high = max(r.start, i * c), min(r.stop, (i + 1) * c)
+            block_slices.append(slice(low - r.start, high - r.start))
+            chunk_slices.append(slice(low - i * c, high - i * c))
+        block[tuple(block_slices)] = chunk[tuple(chunk_slices)]
+    return block
+
+def _as_bytes(array: np.ndarray) -> memoryview:
+    """Returns the C-order bytes of an array, without a copy when it is already contiguous."""
+    return memoryview(np.ascontiguousarray(array)).cast("B")
+
+def _pad_chunk(chunk: np.ndarray, volume: VolumeDataset) -> np.ndarray:
+    """Pads an edge chunk to the full chunk shape with the fill value, as Zarr v2 stores expect."""
+    if chunk.shape == tuple(volume.chunk_shape):
+        return chunk
+    padded = np.full(volume.chunk_shape, volume.fill_value, dtype=volume.dtype)
+    padded[tuple(slice(0, s) for s in chunk.shape)] = chunk
+    return padded
@@ -0,0 +1,354 @@
+import os
+import sys
+import numpy as np
+import zarr
+
+from numcodecs import Blosc, GZip, Zstd
+from timeit import default_timer as timer
+from tifffile import TiffFile
+
+from utils.helpers import save_metadata_as_json
+from utils.volume_dataset import list_stored_chunks
+
+SAMPLE_COUNT = 8  # Number of chunks (or TIFF blocks) sampled per array
+SAMPLE_BLOCK_SHAPE = (64, 256, 256)  # Block shape (z, y, x) sampled from TIFF stacks and used when transcoding them
+BENCHMARK_REPEATS = 3  # Each encode/decode is repeated and the fastest run is kept
+MIN_DECODE_THROUGHPUT_MBPS = 1000.0  # Minimum decode speed for a codec to be recommended
+MAX_SAMPLE_ATTEMPTS = 8  # Chunks (or blocks) read per wanted sample before giving up on finding non-fill data
+
+CANDIDATE_CODECS = {
+    "raw": None,
+    "blosc-lz4-noshuffle": Blosc(cname="lz4", clevel=5, shuffle=Blosc.NOSHUFFLE),
+    "blosc-lz4-shuffle": Blosc(cname="lz4", clevel=5, shuffle=Blosc.SHUFFLE),
+    "blosc-lz4-bitshuffle": Blosc(cname="lz4", clevel=5, shuffle=Blosc.BITSHUFFLE),
+    "blosc-zstd-noshuffle": Blosc(cname="zstd", clevel=5, shuffle=Blosc.NOSHUFFLE),
+    "blosc-zstd-shuffle": Blosc(cname="zstd", clevel=5, shuffle=Blosc.SHUFFLE),
+    "blosc-zstd-bitshuffle": Blosc(cname="zstd", clevel=5, shuffle=Blosc.BITSHUFFLE),
+    "zstd": Zstd(level=5),
+    "gzip": GZip(level=5),
+}
+
+def benchmark_compression(file_path: str, report_path: str, sample_count: int = SAMPLE_COUNT, seed: int = 0) -> None:
+    """Benchmarks candidate compression codecs on chunks sampled from a local Zarr container or TIFF file
+    and saves a report with compression ratio, encode/decode throughput and a recommended codec per array.
+
+    Args:
+        file_path (str): The path to the Zarr container or TIFF file.
+        report_path (str): The path to save the benchmark report JSON file.
+        sample_count (int): The number of chunks (or TIFF blocks) sampled per array.
+        seed (int): The seed used to pick the sampled chunks, so reports are reproducible.
+    """
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"File {file_path} not found. Pull it from DVC store by running 'dvc pull'.")
+
+    if os.path.exists(report_path):
+        print(f"Compression report {report_path} already exists. Skipping benchmark.")
+        return
+
+    print(f"Compression report not found at {report_path}. Benchmarking codecs on {file_path}...")
+    try:
+        start_time = timer()
+        rng = np.random.default_rng(seed)
+        report = {
+            "source": file_path,
+            "sample_count": sample_count,
+            "min_decode_throughput_mbps": MIN_DECODE_THROUGHPUT_MBPS,
+            "arrays": {}
+        }
+
+        if file_path.lower().endswith((".tif", ".tiff")):
+            with TiffFile(file_path) as tif:
+                series = tif.series[0]
+                samples, fill_only_count = __sample_tif_blocks(tif, sample_count, rng)
+                report["arrays"][series.name or "series_0"] = __benchmark_samples(
+                    samples, series.shape, series.dtype, current_compressor=None, fill_only_count=fill_only_count
+                )
+        else:
+            for array_path, zarray in __collect_zarr_arrays(zarr.open(file_path, mode='r')):
+                samples, fill_only_count = __sample_zarr_chunks(zarray, sample_count, rng)
+                report["arrays"][array_path] = __benchmark_samples(
+                    samples, zarray.shape, zarray.dtype, current_compressor=zarray.compressor,
+                    fill_only_count=fill_only_count
+                )
+
+        end_time = timer()
+        print(f"Compression benchmark completed in {(end_time - start_time):.2f} seconds.")
+
+        save_metadata_as_json(report, report_path)
+    except Exception as e:
+        print(f"Error benchmarking compression for {file_path}: {e}", file=sys.stderr)
+
+def transcode_volume(file_path: str, save_path: str, codec_name: str, chunks: tuple = None) -> None:
+    """Rewrites a local Zarr container or TIFF file as a Zarr container compressed with the chosen codec.
+    Zarr groups keep their hierarchy and attributes; TIFF files become a single array.
+
+    Args:
+        file_path (str): The path to the source Zarr container or TIFF file.
+        save_path (str): The path of the Zarr container to create.
+        codec_name (str): A key of CANDIDATE_CODECS (e.g. a report's "recommended_codec").
+        chunks (tuple): Optional chunk shape for the new array, when the source is a single array.
+            Zarr sources keep their own chunks by default (always for groups) and TIFF sources
+            use SAMPLE_BLOCK_SHAPE.
+    """
+    if codec_name not in CANDIDATE_CODECS:
+        raise ValueError(f"Unknown codec '{codec_name}'. Choose one of: {', '.join(CANDIDATE_CODECS)}.")
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"File {file_path} not found. Pull it from DVC store by running 'dvc pull'.")
+
+    if os.path.exists(save_path):
+        print(f"\nTranscoded volume already exists at {save_path}. Skipping transcoding.")
+        return
+
+    print(f"\nTranscoding {file_path} to {save_path} with codec '{codec_name}'...")
+    compressor = CANDIDATE_CODECS[codec_name]
+
+    try:
+        start_time = timer()
+
+        if file_path.lower().endswith((".tif", ".tiff")):
+            __transcode_tif(file_path, save_path, compressor, chunks)
+        else:
+            source = zarr.open(file_path, mode='r')
+            if isinstance(source, zarr.hierarchy.Group):
+                if chunks is not None:
+                    # Arrays of a group (e.g. multiscale levels) differ in shape, so one chunk shape cannot fit all
+                    print(f"Ignoring chunks={chunks} for group {file_path}: arrays keep their own chunks.", file=sys.stderr)
+                zarr.copy_all(source, zarr.open_group(save_path, mode='w'), compressor=compressor)
+            elif isinstance(source, zarr.core.Array):
+                target = zarr.open_array(
+                    save_path, mode='w', shape=source.shape, dtype=source.dtype, chunks=chunks or source.chunks,
+                    compressor=compressor, fill_value=source.fill_value, order=source.order
+                )
+                target.attrs.update(source.attrs.asdict())
+                __copy_in_slabs(lambda start, end: source[start:end], target)
+            else:
+                raise ValueError("Unknown Zarr object type at root.")
+
+        end_time = timer()
+        print(f"Transcoding completed in {(end_time - start_time):.2f} seconds.")
+    except Exception as e:
+        print(f"Error transcoding {file_path}: {e}", file=sys.stderr)
+
+def __collect_zarr_arrays(zarr_content: object) -> list:
+    """Lists all arrays of a Zarr container, recursing into groups.
+
+    Args:
+        zarr_content (object): An opened Zarr group or array.
+
+    Returns:
+        list: (array_path, zarr.core.Array) tuples.
+    """
+    if isinstance(zarr_content, zarr.core.Array):
+        return [(zarr_content.path or "/", zarr_content)]
+    if isinstance(zarr_content, zarr.hierarchy.Group):
+        return [(zarray.path, zarray) for _, zarray in zarr_content.arrays(recurse=True)]
+    raise ValueError("Unknown Zarr object type at root.")
+
+def __sample_zarr_chunks(zarray: zarr.core.Array, sample_count: int, rng: np.random.Generator) -> tuple:
+    """Reads randomly chosen chunks of a Zarr array as decoded numpy arrays. Only stored chunks are
+    considered (missing keys hold only the fill value), and chunks holding only the fill value are
+    skipped, so the samples represent the actual data.
+
+    Args:
+        zarray (zarr.core.Array): The Zarr array to sample.
+        sample_count (int): The maximum number of chunks to keep.
+        rng (np.random.Generator): The random generator used to pick chunks.
+
+    Returns:
+        tuple: The sampled chunks as numpy arrays, and the number of fill-only chunks skipped.
+    """
+    stored_chunks = list_stored_chunks(zarray)
+    if stored_chunks is None:
+        candidates = rng.permutation(int(zarray.nchunks))
+        stored_chunks = [np.unravel_index(flat_index, zarray.cdata_shape) for flat_index in candidates]
+    else:
+        stored_chunks = [stored_chunks[i] for i in rng.permutation(len(stored_chunks))]
+
+    samples, fill_only = [], []
+    for chunk_index in stored_chunks[:sample_count * MAX_SAMPLE_ATTEMPTS]:
+        region = tuple(
+            slice(i * c, min((i + 1) * c, s))
+            for i, c, s in zip(chunk_index, zarray.chunks, zarray.shape)
+        )
+        chunk = np.ascontiguousarray(zarray[region])
+        (fill_only if __is_fill_only(chunk, zarray.fill_value) else samples).append(chunk)
+        if len(samples) == sample_count:
+            break
+    if not samples:
+        # Nothing but fill values: benchmark those rather than nothing
+        samples = fill_only[:sample_count]
+    return samples, len(fill_only)
+
+def __is_fill_only(sample: np.ndarray, fill_value: object) -> bool:
+    """Checks whether a sample holds only the fill value (NaN fill values included)."""
+    if fill_value is None:
+        return False
+    if np.asarray(fill_value).dtype.kind == "f" and np.isnan(fill_value):
+        return bool(np.isnan(sample).all())
+    return bool((sample == fill_value).all())
+
+def __sample_tif_blocks(tif: TiffFile, sample_count: int, rng: np.random.Generator) -> tuple:
+    """Reads randomly positioned blocks of SAMPLE_BLOCK_SHAPE from the first series of a TIFF file.
+    Blocks are read a few pages at a time, so the whole stack is never loaded into memory.
+    Blocks holding only zeros (e.g. padding around the sample) are skipped.
+
+    Args:
+        tif (TiffFile): The opened TIFF file.
+        sample_count (int): The number of blocks to read.
+        rng (np.random.Generator): The random generator used to position blocks.
+
+    Returns:
+        tuple: The sampled blocks as numpy arrays, and the number of zero-only blocks skipped.
+    """
+    series = tif.series[0]
+    if series.ndim == 2:
+        # Single-page TIFF: the whole image is the only block
+        return [np.ascontiguousarray(series.asarray())], 0
+
+    depth, height, width = series.shape[:3]
+    block_depth, block_height, block_width = (min(b, s) for b, s in zip(SAMPLE_BLOCK_SHAPE, (depth, height, width)))
+    samples, fill_only = [], []
+    for _ in range(sample_count * MAX_SAMPLE_ATTEMPTS):
+        z = int(rng.integers(0, depth - block_depth + 1))
+        y = int(rng.integers(0, height - block_height + 1))
+        x = int(rng.integers(0, width - block_width + 1))
+        pages = series.asarray(key=range(z, z + block_depth))
+        block = np.ascontiguousarray(pages[:, y:y + block_height, x:x + block_width])
+        (fill_only if __is_fill_only(block, 0) else samples).append(block)
+        if len(samples) == sample_count:
+            break
+    if not samples:
+        samples = fill_only[:sample_count]
+    return samples, len(fill_only)
+
+def __benchmark_samples(samples: list, shape: tuple, dtype: np.dtype, current_compressor: object,
+                        fill_only_count: int = 0) -> dict:
+    """Encodes and decodes the sampled chunks with every candidate codec.
+
+    Args:
+        samples (list): The sampled chunks as numpy arrays.
+        shape (tuple): The full array shape, recorded in the report.
+        dtype (np.dtype): The array dtype, recorded in the report.
+        current_compressor (object): The compressor the array is stored with, benchmarked as "current" if set.
+        fill_only_count (int): The number of fill-only chunks skipped while sampling.
+
+    Returns:
+        dict: The per-codec results and the recommended codec for the array.
+    """
+    codecs = dict(CANDIDATE_CODECS)
+    if current_compressor is not None:
+        codecs["current"] = current_compressor
+
+    raw_bytes = sum(sample.nbytes for sample in samples)
+    codec_results = {}
+    for codec_name, codec in codecs.items():
+        encoded_bytes, encode_seconds, decode_seconds = 0, 0.0, 0.0
+        for sample in samples:
+            encoded, encode_time = __time_fastest(lambda: __encode(codec, sample))
+            decoded, decode_time = __time_fastest(lambda: __decode(codec, encoded, sample))
+            if not np.array_equal(decoded, sample):
+                raise ValueError(f"Codec '{codec_name}' did not round-trip a sampled chunk.")
+            encoded_bytes += len(encoded)
+            encode_seconds += encode_time
+            decode_seconds += decode_time
+
+        codec_results[codec_name] = {
+            "codec": str(codec) if codec is not None else None,
+            "compression_ratio": round(raw_bytes / encoded_bytes, 3) if encoded_bytes else None,
+            "encode_throughput_mbps": round(raw_bytes / 1e6 / encode_seconds, 1) if encode_seconds else None,
+            "decode_throughput_mbps": round(raw_bytes / 1e6 / decode_seconds, 1) if decode_seconds else None,
+        }
+
+    return {
+        "shape": list(shape),
+        "dtype": str(dtype),
+        "current_compressor": str(current_compressor) if current_compressor is not None else None,
+        "sampled_chunks": len(samples),
+        "sampled_bytes": int(raw_bytes),
+        # Share of the inspected chunks that held only the fill value and were left out of the benchmark
+        "fill_only_fraction": round(fill_only_count / (fill_only_count + len(samples)), 3) if samples else None,
+        "codecs": codec_results,
+        "recommended_codec": __select_codec(codec_results),
+    }
+
+def __select_codec(codec_results: dict) -> str:
+    """Picks the codec with the best compression ratio among those decoding at least
+    MIN_DECODE_THROUGHPUT_MBPS, falling back to the fastest decoder if none does.
+    "current" is never recommended, since it is not a codec that can be transcoded to.
+
+    Args:
+        codec_results (dict): The per-codec benchmark results.
+
+    Returns:
+        str: The name of the recommended codec.
+    """
+    candidates = {name: result for name, result in codec_results.items() if name in CANDIDATE_CODECS}
+    fast_enough = {
+        name: result for name, result in candidates.items()
+        if (result["decode_throughput_mbps"] or 0) >= MIN_DECODE_THROUGHPUT_MBPS
+    }
+    if fast_enough:
+        return max(fast_enough, key=lambda name: fast_enough[name]["compression_ratio"] or 0)
+    return max(candidates, key=lambda name: candidates[name]["decode_throughput_mbps"] or 0)
+
+def __encode(codec: object, sample: np.ndarray) -> bytes:
+    """Encodes a chunk with a codec, or returns its raw bytes when codec is None."""
+    if codec is None:
+        return sample.tobytes()
+    return bytes(codec.encode(sample))
+
+def __decode(codec: object, encoded: bytes, sample: np.ndarray) -> np.ndarray:
+    """Decodes a chunk back to an array shaped like the original sample."""
+    if codec is None:
+        decoded = np.frombuffer(encoded, dtype=sample.dtype).copy()
+    else:
+        decoded = np.frombuffer(codec.decode(encoded), dtype=sample.dtype)
+    return decoded.reshape(sample.shape)
+
+def __time_fastest(operation: callable) -> tuple:
+    """Runs an operation BENCHMARK_REPEATS times.
+
+    Returns:
+        tuple: The result of the last run and the fastest run time in seconds.
+    """
+    best_time = float("inf")
+    result = None
+    for _ in range(BENCHMARK_REPEATS):
+        start_time = timer()
+        result = operation()
+        best_time = min(best_time, timer() - start_time)
+    return result, best_time
+
+def __transcode_tif(file_path: str, save_path: str, compressor: object, chunks: tuple) -> None:
+    """Writes the first series of a TIFF file into a new Zarr array, one slab of pages at a time.
+
+    Args:
+        file_path (str): The path to the TIFF file.
+        save_path (str): The path of the Zarr array to create.
+        compressor (object): The numcodecs compressor (None for raw).
+        chunks (tuple): The chunk shape of the new array; defaults to SAMPLE_BLOCK_SHAPE.
+    """
+    with TiffFile(file_path) as tif:
+        series = tif.series[0]
+        if chunks is None:
+            chunks = SAMPLE_BLOCK_SHAPE[-series.ndim:] if series.ndim <= len(SAMPLE_BLOCK_SHAPE) else True
+        target = zarr.open_array(
+            save_path, mode='w', shape=series.shape, dtype=series.dtype, chunks=chunks, compressor=compressor
+        )
+        if series.ndim == 2:
+            target[...] = series.asarray()
+        else:
+            __copy_in_slabs(lambda start, end: series.asarray(key=range(start, end)), target)
+
+def __copy_in_slabs(read_slab: callable, target: zarr.core.Array) -> None:
+    """Fills a Zarr array one slab of chunks (along the first axis) at a time,
+    so only a single slab of the source is held in memory.
+
+    Args:
+        read_slab (callable): Returns the source data between two indices of the first axis.
+        target (zarr.core.Array): The Zarr array to fill.
+    """
+    slab_depth = target.chunks[0]
+    for start in range(0, target.shape[0], slab_depth):
+        end = min(start + slab_depth, target.shape[0])
+        target[start:end] = read_slab(start, end)
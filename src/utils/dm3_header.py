@@ -0,0 +1,249 @@
+import mmap
+import struct
+import numpy as np
+
+DM3_HEADER_SIZE = 12  # Version, file size and byte order, each a big-endian 4-byte integer
+DM3_TAG_GROUP = 20
+DM3_TAG_DATA = 21
+MAX_STRING_ARRAY_LENGTH = 256  # Shorter USHORT arrays hold UTF-16 strings (same rule as pyDM3reader)
+
+# Encoded tag types: struct format of the simple types, and the compound types
+SIMPLE_TYPE_FORMATS = {2: "h", 3: "i", 4: "H", 5: "I", 6: "f", 7: "d", 8: "?", 9: "c", 10: "B", 11: "q", 12: "Q"}
+USHORT_TYPE = 4
+STRUCT_TYPE = 15
+STRING_TYPE = 18
+ARRAY_TYPE = 20
+
+# Gatan image data types: name (as reported by pyDM3reader) and numpy dtype with channel count.
+# Dtypes have no byte order: pixels are stored in the byte order given in the file header
+DATA_TYPES = {
+    0: ("NULL_DATA", None), 1: ("SIGNED_INT16_DATA", ("i2", 1)), 2: ("REAL4_DATA", ("f4", 1)),
+    3: ("COMPLEX8_DATA", ("c8", 1)), 4: ("OBSELETE_DATA", None), 5: ("PACKED_DATA", None),
+    6: ("UNSIGNED_INT8_DATA", ("u1", 1)), 7: ("SIGNED_INT32_DATA", ("i4", 1)), 8: ("RGB_DATA", ("u1", 4)),
+    9: ("SIGNED_INT8_DATA", ("i1", 1)), 10: ("UNSIGNED_INT16_DATA", ("u2", 1)),
+    11: ("UNSIGNED_INT32_DATA", ("u4", 1)), 12: ("REAL8_DATA", ("f8", 1)), 13: ("COMPLEX16_DATA", ("c16", 1)),
+    14: ("BINARY_DATA", ("u1", 1)), 15: ("RGB_UINT8_0_DATA", ("u1", 4)), 16: ("RGB_UINT8_1_DATA", ("u1", 4)),
+    17: ("RGB_UINT16_DATA", ("u2", 4)), 18: ("RGB_FLOAT32_DATA", ("f4", 3)), 19: ("RGB_FLOAT64_DATA", ("f8", 3)),
+    20: ("RGBA_UINT8_0_DATA", ("u1", 4)), 21: ("RGBA_UINT8_1_DATA", ("u1", 4)), 22: ("RGBA_UINT8_2_DATA", ("u1", 4)),
+    23: ("RGBA_UINT8_3_DATA", ("u1", 4)), 24: ("RGBA_UINT16_DATA", ("u2", 4)), 25: ("RGBA_FLOAT32_DATA", ("f4", 4)),
+    26: ("RGBA_FLOAT64_DATA", ("f8", 4)), 35: ("SIGNED_INT64_DATA", ("i8", 1)), 36: ("UNSIGNED_INT64_DATA", ("u8", 1)),
+}
+
+# Image info entries (as reported by pyDM3reader) and the tag each is read from, relative to the image
+INFO_TAGS = {
+    "gms_v": "ImageTags.GMS Version.Created",
+    "gms_v_": "ImageTags.GMS Version.Saved",
+    "acq_date": "ImageTags.DataBar.Acquisition Date",
+    "acq_time": "ImageTags.DataBar.Acquisition Time",
+    "hv": "ImageTags.Microscope Info.Voltage",
+    "hv_f": "ImageTags.Microscope Info.Formatted Voltage",
+    "mag": "ImageTags.Microscope Info.Indicated Magnification",
+    "mag_f": "ImageTags.Microscope Info.Formatted Indicated Mag",
+    "mode": "ImageTags.Microscope Info.Operation Mode",
+    "micro": "ImageTags.Session Info.Microscope",
+    "operator": "ImageTags.Session Info.Operator",
+    "specimen": "ImageTags.Session Info.Specimen",
+    "name_old": "ImageTags.Microscope Info.Name",
+}
+
+def read_dm3_header(file_path: str) -> dict:
+    """Reads the metadata of a DM3 file by walking only its tag directory. The file is memory-mapped
+    and array tags (including the pixel data) are skipped without being read.
+
+    Args:
+        file_path (str): The path to the DM3 file.
+
+    Returns:
+        dict: The same metadata as pyDM3reader ("filename", "file_version", "image_summary",
+              "full_original_tags", "info"), plus "pixel_data" with the offset, size, dtype
+              and shape needed to memory-map the main image.
+    """
+    with open(file_path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        file_version, _, byte_order = struct.unpack_from(">iii", buffer, 0)
+        if file_version != 3:
+            raise ValueError(f"{file_path} is not a DM3 file (version {file_version}).")
+        data_byte_order = "<" if byte_order == 1 else ">"
+        tags = _Dm3TagReader(buffer, data_byte_order).read_tags()
+
+    image_prefix = __main_image_prefix(tags)
+    data_type = int(tags[f"{image_prefix}.ImageData.DataType"])
+    data_type_name, numpy_type = DATA_TYPES.get(data_type, (None, None))
+    dimensions = []
+    while f"{image_prefix}.ImageData.Dimensions.{len(dimensions)}" in tags:
+        dimensions.append(int(tags[f"{image_prefix}.ImageData.Dimensions.{len(dimensions)}"]))
+
+    pixel_size_value, pixel_size_unit = None, None
+    scale_tag = f"{image_prefix}.ImageData.Calibrations.Dimension.0.Scale"
+    if scale_tag in tags:
+        pixel_size_value = float(tags[scale_tag])
+        pixel_size_unit = tags.get(f"{image_prefix}.ImageData.Calibrations.Dimension.0.Units", "")
+        if pixel_size_unit == "µm":
+            pixel_size_unit = "micron"
+
+    cuts = None
+    low_tag, high_tag = "root.DocumentObjectList.0.ImageDisplayInfo.LowLimit", "root.DocumentObjectList.0.ImageDisplayInfo.HighLimit"
+    if low_tag in tags and high_tag in tags:
+        cast = int if numpy_type and np.dtype(numpy_type[0]).kind in "iub" else float
+        cuts = [cast(float(tags[low_tag])), cast(float(tags[high_tag]))]
+
+    pixel_data = None
+    if numpy_type is not None:
+        dtype, channels = numpy_type
+        # Dimensions are stored fastest axis first (x, y, z); numpy shapes are slowest axis first
+        shape = dimensions[::-1] + ([channels] if channels > 1 else [])
+        pixel_data = {
+            "offset": int(tags[f"{image_prefix}.ImageData.Data.Offset"]),
+            "nbytes": int(tags[f"{image_prefix}.ImageData.Data.Size"]),
+            "dtype": np.dtype(dtype).newbyteorder(data_byte_order).str,
+            "shape": shape,
+        }
+
+    info = {
+        key: tags[f"{image_prefix}.{tag_name}"]
+        for key, tag_name in INFO_TAGS.items() if f"{image_prefix}.{tag_name}" in tags
+    }
+
+    return {
+        "filename": file_path,
+        "file_version": file_version,
+        "image_summary": {
+            "size": dimensions,
+            "dtype": data_type_name,
+            "pixel_size_value": pixel_size_value,
+            "pixel_size_unit": pixel_size_unit,
+            "cuts": cuts,
+        },
+        "full_original_tags": tags,
+        "info": info,
+        "pixel_data": pixel_data,
+    }
+
+def memmap_dm3_image(file_path: str, pixel_data: dict = None) -> np.memmap:
+    """Memory-maps the main image of a DM3 file without reading it.
+
+    Args:
+        file_path (str): The path to the DM3 file.
+        pixel_data (dict): The "pixel_data" entry of read_dm3_header (or of saved metadata);
+            read from the file header when not given.
+
+    Returns:
+        np.memmap: The image, shaped (height, width) or (depth, height, width).
+    """
+    if pixel_data is None:
+        pixel_data = read_dm3_header(file_path)["pixel_data"]
+    if pixel_data is None:
+        raise ValueError(f"Unsupported image data type in {file_path}.")
+    return np.memmap(file_path, dtype=pixel_data["dtype"], mode="r",
+                     offset=pixel_data["offset"], shape=tuple(pixel_data["shape"]))
+
+class _Dm3TagReader:
+    """Walks the DM3 tag tree, naming tags like pyDM3reader ('root.Group.Subgroup.Label',
+    unlabeled entries use their index). Simple values are stored as strings, short USHORT
+    arrays as decoded strings, other arrays as '<tag>.Size' and '<tag>.Offset' (bytes, not read),
+    and struct values are skipped.
+    """
+
+    def __init__(self, buffer: mmap.mmap, data_byte_order: str):
+        self.buffer = buffer
+        self.data_byte_order = data_byte_order
+        self.position = DM3_HEADER_SIZE
+        self.tags = {}
+
+    def read_tags(self) -> dict:
+        self._read_group("root")
+        return self.tags
+
+    def _read_be(self, format_char: str) -> int:
+        """Reads a big-endian value of the tag structure."""
+        value = struct.unpack_from(f">{format_char}", self.buffer, self.position)[0]
+        self.position += struct.calcsize(format_char)
+        return value
+
+    def _read_group(self, group_name: str) -> None:
+        self.position += 2  # "sorted" and "open" flags
+        tag_count = self._read_be("i")
+        for tag_index in range(tag_count):
+            entry_type = self.buffer[self.position]
+            self.position += 1
+            label_length = self._read_be("H")
+            label = self.buffer[self.position:self.position + label_length].decode("latin-1") if label_length else str(tag_index)
+            self.position += label_length
+            tag_name = f"{group_name}.{label}"
+            if entry_type == DM3_TAG_GROUP:
+                self._read_group(tag_name)
+            elif entry_type == DM3_TAG_DATA:
+                self._read_data(tag_name)
+            else:
+                raise ValueError(f"Unknown tag entry type {entry_type} at offset {self.position - 1}.")
+
+    def _read_data(self, tag_name: str) -> None:
+        delimiter = self.buffer[self.position:self.position + 4]
+        if delimiter != b"%%%%":
+            raise ValueError(f"Tag type delimiter not found at offset {self.position}.")
+        self.position += 8  # Delimiter and the length of the type description
+        encoded_type = self._read_be("i")
+
+        if encoded_type in SIMPLE_TYPE_FORMATS:
+            self.tags[tag_name] = _format_value(self._read_value(SIMPLE_TYPE_FORMATS[encoded_type]))
+        elif encoded_type == STRING_TYPE:
+            string_length = self._read_be("i")
+            self.tags[tag_name] = self._read_utf16(string_length)
+        elif encoded_type == STRUCT_TYPE:
+            field_types = self._read_struct_types()
+            self.position += sum(struct.calcsize(SIMPLE_TYPE_FORMATS[t]) for t in field_types)
+        elif encoded_type == ARRAY_TYPE:
+            item_types = self._read_array_types()
+            array_length = self._read_be("i")
+            byte_count = array_length * sum(struct.calcsize(SIMPLE_TYPE_FORMATS[t]) for t in item_types)
+            if (not tag_name.endswith("ImageData.Data") and item_types == [USHORT_TYPE]
+                    and array_length < MAX_STRING_ARRAY_LENGTH):
+                self.tags[tag_name] = self._read_utf16(byte_count)
+            else:
+                self.tags[f"{tag_name}.Size"] = str(byte_count)
+                self.tags[f"{tag_name}.Offset"] = str(self.position)
+                self.position += byte_count  # Skip the array (e.g. pixel data) without reading it
+        else:
+            raise ValueError(f"Unknown encoded type {encoded_type} for tag {tag_name}.")
+
+    def _read_value(self, format_char: str) -> object:
+        value = struct.unpack_from(f"{self.data_byte_order}{format_char}", self.buffer, self.position)[0]
+        self.position += struct.calcsize(format_char)
+        return value
+
+    def _read_utf16(self, byte_count: int) -> str:
+        raw = self.buffer[self.position:self.position + byte_count]
+        self.position += byte_count
+        return raw.decode("utf-16-le" if self.data_byte_order == "<" else "utf-16-be", errors="ignore")
+
+    def _read_struct_types(self) -> list:
+        self.position += 4  # Struct name length
+        field_count = self._read_be("i")
+        field_types = []
+        for _ in range(field_count):
+            self.position += 4  # Field name length
+            field_types.append(self._read_be("i"))
+        return field_types
+
+    def _read_array_types(self) -> list:
+        array_type = self._read_be("i")
+        if array_type == STRUCT_TYPE:
+            return self._read_struct_types()
+        if array_type == ARRAY_TYPE:
+            return self._read_array_types()
+        return [array_type]
+
+def __main_image_prefix(tags: dict) -> str:
+    """Returns the tag prefix of the main image: the last ImageList entry with pixel data
+    (entry 0 is usually the thumbnail)."""
+    image_index = 0
+    while f"root.ImageList.{image_index + 1}.ImageData.DataType" in tags:
+        image_index += 1
+    if f"root.ImageList.{image_index}.ImageData.DataType" not in tags:
+        raise ValueError("No image found in the DM3 tag tree.")
+    return f"root.ImageList.{image_index}"
+
+def _format_value(value: object) -> str:
+    """Formats a simple tag value as a string, like pyDM3reader."""
+    if isinstance(value, bytes):
+        return value.decode("latin-1")
+    return str(value)
@@ -0,0 +1,304 @@
+import fnmatch
+import ftplib
+import json
+import os
+import posixpath
+import queue
+import re
+import sys
+import threading
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from timeit import default_timer as timer
+
+MAX_FTP_CONNECTIONS = 4  # Concurrent FTP connections used to list and download
+FTP_PORT = 21
+FTP_TIMEOUT = 60  # Seconds before an FTP operation is considered failed
+MAX_CRAWL_DEPTH = 32  # Deeper directories are skipped, e.g. symlinks pointing back at a parent
+MLSD_TIME_PATTERN = re.compile(r"\d{14}(\.\d+)?")  # YYYYMMDDHHMMSS[.sss], as in MLSD modify facts
+
+class FtpConnectionPool:
+    """Pool of anonymous FTP connections to one host, so directories can be listed and files
+    downloaded concurrently (an ftplib connection only serves one command at a time).
+    """
+
+    def __init__(self, host: str, max_connections: int = MAX_FTP_CONNECTIONS, port: int = FTP_PORT):
+        self.host = host
+        self.port = port
+        self.max_connections = max_connections
+        self._idle = queue.Queue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._mlsd_supported = None  # Detected on the first listing
+
+    @contextmanager
+    def connection(self):
+        """Borrows a connection, creating one if fewer than max_connections exist.
+        A connection used by a failed operation (of any kind, in case it was left mid-transfer)
+        is closed and its slot released instead of being returned to the pool."""
+        ftp = None
+        while ftp is None:
+            try:
+                ftp = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    can_create = self._created < self.max_connections
+                    if can_create:
+                        self._created += 1
+                if can_create:
+                    ftp = self._connect()
+                else:
+                    try:
+                        # Wait for a connection to be returned, rechecking periodically in case one failed
+                        ftp = self._idle.get(timeout=1)
+                    except queue.Empty:
+                        pass
+        try:
+            yield ftp
+        except BaseException:
+            _close_quietly(ftp)
+            with self._lock:
+                self._created -= 1
+            raise
+        else:
+            self._idle.put(ftp)
+
+    def close(self) -> None:
+        """Closes all idle connections."""
+        while not self._idle.empty():
+            _close_quietly(self._idle.get_nowait())
+
+    def list_directory(self, remote_path: str) -> list:
+        """Lists a remote directory with MLSD when the server supports it, else by parsing LIST.
+
+        Args:
+            remote_path (str): The absolute remote directory path.
+
+        Returns:
+            list: (name, facts) tuples, where facts holds "type" ("file" or "dir"), "size" and "modify".
+                Symlinks from LIST are resolved to their target's type; MLSD listings leave them out.
+        """
+        with self.connection() as ftp:
+            if self._mlsd_supported is not False:
+                try:
+                    entries = [
+                        (name, {"type": facts.get("type", "file").lower(),
+                                "size": int(facts.get("size", facts.get("sizd", 0))),
+                                "modify": facts.get("modify")})
+                        for name, facts in ftp.mlsd(remote_path)
+                    ]
+                    self._mlsd_supported = True
+                    return [(name, facts) for name, facts in entries if facts["type"] in ("file", "dir")]
+                except ftplib.error_perm as e:
+                    if self._mlsd_supported is None and str(e)[:3] in ("500", "501", "502", "504"):
+                        print(f"MLSD not supported by {self.host}. Falling back to LIST.")
+                        self._mlsd_supported = False
+                    else:
+                        raise
+
+            lines = []
+            ftp.retrlines(f"LIST {remote_path}", lines.append)
+            entries = []
+            for name, facts in (entry for entry in map(_parse_list_line, lines) if entry is not None):
+                if facts["type"] == "link":
+                    facts = _resolve_link(ftp, posixpath.join(remote_path, name), facts)
+                    if facts is None:
+                        continue
+                entries.append((name, facts))
+            return entries
+
+    def download(self, remote_file: str, local_file: str) -> None:
+        """Downloads a remote file. Data is written to a .part file that is renamed when complete
+        and deleted if the transfer fails, so an interrupted transfer never looks like a finished file."""
+        os.makedirs(os.path.dirname(local_file) or ".", exist_ok=True)
+        partial_file = f"{local_file}.part"
+        try:
+            with self.connection() as ftp:
+                with open(partial_file, "wb") as file:
+                    ftp.retrbinary(f"RETR {remote_file}", file.write)
+            os.replace(partial_file, local_file)
+        except BaseException:
+            if os.path.exists(partial_file):
+                os.remove(partial_file)
+            raise
+
+    def _connect(self) -> ftplib.FTP:
+        ftp = ftplib.FTP(timeout=FTP_TIMEOUT)
+        try:
+            ftp.connect(self.host, self.port)
+            ftp.login()  # No username/password needed for anonymous login for public FTPs
+        except ftplib.all_errors:
+            _close_quietly(ftp)
+            with self._lock:
+                self._created -= 1
+            raise
+        ftp.encoding = "utf-8"  # Ensure correct encoding for filenames
+        return ftp
+
+def crawl_ftp_tree(pool: FtpConnectionPool, remote_path: str, file_pattern: str = None, cached_listing: dict = None) -> dict:
+    """Recursively lists a remote directory tree, listing subdirectories concurrently.
+
+    Args:
+        pool (FtpConnectionPool): The connections to list with.
+        remote_path (str): The absolute remote directory path.
+        file_pattern (str): Optional fnmatch pattern; only matching file names are kept.
+        cached_listing (dict): Optional listing of the last crawl. The entries of subdirectories
+            that fail to list are kept from it instead of being dropped.
+
+    Returns:
+        dict: Maps file paths relative to remote_path to {"size", "modify"}.
+
+    Raises:
+        ftplib.all_errors: If remote_path itself cannot be listed.
+    """
+    remote_files = {}
+    with ThreadPoolExecutor(max_workers=pool.max_connections) as executor:
+        pending = {executor.submit(pool.list_directory, remote_path): ""}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                relative_dir = pending.pop(future)
+                try:
+                    entries = future.result()
+                except ftplib.all_errors as e:
+                    if not relative_dir:
+                        raise
+                    print(f"Error listing {posixpath.join(remote_path, relative_dir)}: {e}. Keeping its cached entries.", file=sys.stderr)
+                    prefix = relative_dir + "/"
+                    remote_files.update({path: facts for path, facts in (cached_listing or {}).items() if path.startswith(prefix)})
+                    continue
+                for name, facts in entries:
+                    relative_path = posixpath.join(relative_dir, name) if relative_dir else name
+                    if facts["type"] == "dir":
+                        if relative_path.count("/") >= MAX_CRAWL_DEPTH:
+                            print(f"Skipping {posixpath.join(remote_path, relative_path)}: deeper than {MAX_CRAWL_DEPTH} directories.", file=sys.stderr)
+                            continue
+                        pending[executor.submit(pool.list_directory, posixpath.join(remote_path, relative_path))] = relative_path
+                    elif file_pattern is None or fnmatch.fnmatch(name, file_pattern):
+                        remote_files[relative_path] = {"size": facts["size"], "modify": facts["modify"]}
+    return remote_files
+
+def sync_ftp_directory(host: str, remote_path: str, save_path: str, listing_path: str,
+                       file_pattern: str = None, max_connections: int = MAX_FTP_CONNECTIONS, port: int = FTP_PORT) -> None:
+    """Mirrors a remote FTP directory tree into a local directory, downloading only files that are
+    new or changed since the last sync. The remote listing (name, size, modify time) of the last
+    sync is cached in a JSON file and compared with a fresh concurrent crawl. Files without a cached
+    entry are kept if a local copy of the same size exists (e.g. restored with 'dvc pull').
+
+    Args:
+        host (str): The FTP host.
+        remote_path (str): The absolute remote directory path.
+        save_path (str): The local directory to save files to.
+        listing_path (str): The JSON file caching the remote listing of the last sync.
+        file_pattern (str): Optional fnmatch pattern; only matching file names are synced.
+        max_connections (int): The number of concurrent FTP connections.
+        port (int): The FTP port.
+    """
+    cached_listing = {}
+    if os.path.exists(listing_path):
+        try:
+            with open(listing_path, "r", encoding="utf-8") as listing_file:
+                cached_listing = json.load(listing_file).get("files", {})
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Error reading cached listing {listing_path}: {e}. Doing a full sync.", file=sys.stderr)
+
+    pool = FtpConnectionPool(host, max_connections, port)
+    try:
+        print(f"\nListing {host}{remote_path}...")
+        start_time = timer()
+        remote_files = crawl_ftp_tree(pool, remote_path, file_pattern, cached_listing)
+        print(f"Found {len(remote_files)} files in {(timer() - start_time):.2f} seconds.")
+
+        # Without a cached entry (e.g. files restored with 'dvc pull'), a local file of the same size
+        # counts as synced; with one, a changed size or modify time means the remote file changed
+        to_download = [
+            relative_path for relative_path, facts in remote_files.items()
+            if not _local_file_matches(os.path.join(save_path, relative_path), facts["size"])
+            or relative_path in cached_listing and _remote_file_changed(cached_listing[relative_path], facts)
+        ]
+        print(f"{len(to_download)} new or changed files to download to {save_path}.")
+
+        start_time = timer()
+        failed = set()
+        with ThreadPoolExecutor(max_workers=max_connections) as executor:
+            futures = {
+                executor.submit(pool.download, posixpath.join(remote_path, relative_path),
+                                os.path.join(save_path, *relative_path.split("/"))): relative_path
+                for relative_path in to_download
+            }
+            for future, relative_path in futures.items():
+                try:
+                    future.result()
+                except Exception as e:
+                    failed.add(relative_path)
+                    print(f"Error downloading {relative_path}: {e}", file=sys.stderr)
+        print(f"Download completed in {(timer() - start_time):.2f} seconds.")
+    finally:
+        pool.close()
+
+    # Failed files are left out of the cached listing, so the next sync retries them
+    synced_files = {path: facts for path, facts in remote_files.items() if path not in failed}
+    os.makedirs(os.path.dirname(listing_path) or ".", exist_ok=True)
+    with open(listing_path, "w", encoding="utf-8") as listing_file:
+        json.dump({"host": host, "remote_path": remote_path, "files": synced_files}, listing_file, indent=2)
+
+def _close_quietly(ftp: ftplib.FTP) -> None:
+    """Closes an FTP connection, ignoring errors from connections that already failed."""
+    try:
+        ftp.close()
+    except Exception:
+        pass
+
+def _local_file_matches(local_file: str, size: int) -> bool:
+    """Checks that a local file exists with the expected size."""
+    try:
+        return os.path.getsize(local_file) == size
+    except OSError:
+        return False
+
+def _remote_file_changed(cached_facts: dict, facts: dict) -> bool:
+    """Compares two listings of a remote file. Modify times are only compared when both are MLSD
+    timestamps: LIST dates have no year for recent files and no time for older ones, so they
+    change format as a file ages (or when the server stops supporting MLSD)."""
+    if cached_facts.get("size") != facts["size"]:
+        return True
+    modify_times = (cached_facts.get("modify"), facts["modify"])
+    if all(isinstance(modify, str) and MLSD_TIME_PATTERN.fullmatch(modify) for modify in modify_times):
+        return modify_times[0] != modify_times[1]
+    return False
+
+def _resolve_link(ftp: ftplib.FTP, remote_path: str, facts: dict) -> dict:
+    """Classifies a symlink from a LIST listing by its target: a directory if it can be entered,
+    else a file with the target's size. Returns None for broken links."""
+    try:
+        ftp.cwd(remote_path)
+        return {"type": "dir", "size": 0, "modify": facts["modify"]}
+    except ftplib.error_perm:
+        pass
+    try:
+        ftp.voidcmd("TYPE I")  # SIZE reports the transfer size, which some servers refuse in ASCII mode
+        return {"type": "file", "size": ftp.size(remote_path), "modify": facts["modify"]}
+    except ftplib.error_perm:
+        return None
+
+def _parse_list_line(line: str) -> tuple:
+    """Parses one Unix-style LIST line (e.g. '-rw-r--r-- 1 ftp ftp 1024 Jan 01 12:00 name').
+
+    Returns:
+        tuple: (name, facts) like list_directory, or None for lines that are not files or directories.
+            Symlinks have type "link", as the listing does not tell whether they point to a directory.
+    """
+    fields = line.split(maxsplit=8)
+    if len(fields) < 9 or fields[0][0] not in "-dl":
+        return None
+    name = fields[8]
+    if fields[0][0] == "l":
+        name = name.split(" -> ")[0]
+    if name in (".", ".."):
+        return None
+    return name, {
+        "type": {"d": "dir", "l": "link"}.get(fields[0][0], "file"),
+        "size": int(fields[4]) if fields[4].isdigit() else 0,
+        "modify": " ".join(fields[5:8]),
+    }
@@ -1,21 +1,28 @@
 import os
-import dm3_lib
 import sys
 import numpy as np
 import zarr
 
 from timeit import default_timer as timer
-from tifffile import TiffFile
+from tifffile import TiffFile, TiffPage
 from collections import defaultdict
 
+from utils.dm3_header import read_dm3_header
 from utils.helpers import save_metadata_as_json
+from utils.tiff_index import read_keyframes, scan_tiff_pages
 
-def extract_tif_metadata(file_path: str, metadata_path: str) -> None:
+def extract_tif_metadata(file_path: str, metadata_path: str, fast_scan: bool = False, index_path: str = None) -> None:
     """Extracts all available metadata from a TIFF file using tifffile and saves it to a JSON file.
 
+    In fast scan mode, the page IFDs are indexed directly (see utils/tiff_index.py) and only one
+    page per run of pages with identical tags is parsed, so long uniform stacks are described by
+    a few entries in 'pages' instead of one per page.
+
     Args:
         file_path (str): The path to the TIFF file.
         metadata_path (str): The path to save the extracted metadata JSON file. 
+        fast_scan (bool): Whether to parse only the pages whose tags differ from the previous page.
+        index_path (str): In fast scan mode, optional .npz file to save the page offsets index to.
     """
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"File {file_path} not found. Pull it from DVC store by running 'dvc pull'.")
@@ -30,6 +37,7 @@ def extract_tif_metadata(file_path: str, metadata_path: str) -> None:
             print(f"Extracting all available metadata from {file_path}...")
             all_metadata = {}
             start_time = timer()
+            page_index = scan_tiff_pages(file_path, index_path) if fast_scan else None
 
             # Extraction using tifffile
             with TiffFile(file_path) as tif:
@@ -40,8 +48,9 @@ def extract_tif_metadata(file_path: str, metadata_path: str) -> None:
                     'is_lsm': tif.is_lsm, 
                     'is_fei': tif.is_fei,
                     'byteorder': tif.byteorder,
-                    'series_count': len(tif.series),
-                    'pages_count': len(tif.pages)
+                    # Series detection makes tifffile visit every page, so fast scans skip it
+                    'series_count': None if fast_scan else len(tif.series),
+                    'pages_count': page_index.page_count if fast_scan else len(tif.pages)
                 }
 
                 # 2. OME-XML metadata (if available at the TiffFile level)
@@ -55,39 +64,22 @@ def extract_tif_metadata(file_path: str, metadata_path: str) -> None:
 
                 # 4. Metadata for each individual TIFF page/IFD (Image File Directory)
                 all_metadata['pages'] = []
-                for i, page in enumerate(tif.pages):
-                    page_data = {
-                        'page_index': i,
-                        'shape': page.shape,
-                        'dtype': str(page.dtype),
-                        'is_tiled': page.is_tiled,
-                        'compression': page.compression,
-                        'photometric': page.photometric,
-                        'resolution': page.resolution,
-                        'resolution_unit': page.resolutionunit,
-                        'is_contiguous': page.is_contiguous,
-                        'is_subsampled': page.is_subsampled,
-                        'image_description': page.description,
-                        # Raw TIFF tags for the current page
-                        'page_tiff_tags': {}
-                    }
-
-                    for tag in page.tags.values():
-                        try:
-                            # Attempt to get a more structured representation if available
-                            if hasattr(tag, 'value'):
-                                tag_value = tag.value
-                            elif hasattr(tag, 'asarray'): # For array-like tags
-                                tag_value = tag.asarray().tolist()
-                            else:
-                                tag_value = repr(tag) # Fallback to representation
-                            # Store the tag value in the page data
-                            page_data['page_tiff_tags'][tag.name] = tag_value
-                        except Exception as e:
-                            page_data['page_tiff_tags'][tag.name] = f"Error reading tag: {e}"
-
-                    # Add the page data to the global metadata
-                    all_metadata['pages'].append(page_data)
+                if fast_scan:
+                    # One entry per run of pages sharing the tags of a keyframe. Strip and tile
+                    # offsets differ between pages, so they are left to the page index.
+                    all_metadata['global_info']['uniform_pages'] = page_index.is_uniform
+                    keyframes = read_keyframes(tif, page_index)
+                    for first_page, stop_page, keyframe in page_index.page_groups.tolist():
+                        page_data = __extract_page_metadata(keyframes[keyframe], first_page)
+                        page_data['page_count'] = stop_page - first_page
+                        page_data['keyframe_index'] = keyframe
+                        for tag_name in ('StripOffsets', 'StripByteCounts', 'TileOffsets', 'TileByteCounts'):
+                            page_data['page_tiff_tags'].pop(tag_name, None)
+                        all_metadata['pages'].append(page_data)
+                else:
+                    for i, page in enumerate(tif.pages):
+                        # Add the page data to the global metadata
+                        all_metadata['pages'].append(__extract_page_metadata(page, i))
 
             end_time = timer()
             print(f"All metadata extraction completed in {(end_time - start_time):.2f} seconds.")
@@ -133,10 +125,13 @@ def extract_zarr_metadata(file_path: str, metadata_path: str) -> None:
 
 def extract_dm3_metadata(file_path: str, folder_path: str) -> None:
     """
-    Extracts all available metadata from a DM3 file using pyDM3reader.
+    Extracts all available metadata from a DM3 file by reading only its tag directory.
+    The pixel data is skipped; its offset, dtype and shape are saved under "pixel_data"
+    so the image can later be memory-mapped (see memmap_dm3_image).
 
     Args:
         filepath (str): The path to the DM3 file.
+        folder_path (str): The folder to save the extracted metadata JSON file to.
 
     Returns:
         dict: A dictionary containing all extracted metadata.
@@ -144,40 +139,24 @@ def extract_dm3_metadata(file_path: str, folder_path: str) -> None:
     """
     try:
         if file_path.endswith('.dm3'):
-            # Use pyDM3reader (dm3_lib) to read the DM3 file
-            dm3_file = dm3_lib.DM3(file_path)
-
-            # Get easily accessible metadata
-            metadata = {
-                "filename": dm3_file.filename,
-                "file_version": dm3_file.file_version,
-                "image_summary": {
-                    "size": dm3_file.size,
-                    "dtype": dm3_file.data_type_str if dm3_file.data_type_str else None,
-                    "pixel_size_value": dm3_file.pxsize[0] if dm3_file.pxsize else None,
-                    "pixel_size_unit": dm3_file.pxsize[1] if dm3_file.pxsize else None,
-                    "cuts": dm3_file.cuts
-                }
-            }
+            # Walk the tag tree of the memory-mapped file, without reading the pixel data
+            metadata = read_dm3_header(file_path)
 
-            if dm3_file.tags:
-                # Recursively clean and include the entire tag tree
-                metadata["full_original_tags"] = __convert_to_json_serializable_recursive(dm3_file.tags)
-            
-            if dm3_file.info:
-                # Recursively clean and include the entire info structure
-                metadata["info"] = __convert_to_json_serializable_recursive(dm3_file.info)
+            # Recursively clean the tag tree and info structure
+            metadata["full_original_tags"] = __convert_to_json_serializable_recursive(metadata["full_original_tags"])
+            metadata["info"] = __convert_to_json_serializable_recursive(metadata["info"])
 
             # Save metadata to a JSON file
-            output_filename = dm3_file.filename.split('/')[-1].replace(".", "_")
+            output_filename = metadata["filename"].split('/')[-1].replace(".", "_")
             metadata_file_name = os.path.join(folder_path, f"{output_filename}_metadata.json")
             save_metadata_as_json(metadata, metadata_file_name)
+            return metadata
 
     except FileNotFoundError:
         print(f"Error: File not found at {file_path}", file=sys.stderr)
         return None
     except Exception as e:
-        print(f"Error reading DM3 file {file_path} with pyDM3reader: {e}", file=sys.stderr)
+        print(f"Error reading DM3 file {file_path}: {e}", file=sys.stderr)
         return None
 
 def consolidate_categories(all_metadata_by_filename: dict) -> dict:
@@ -230,6 +209,47 @@ def consolidate_categories(all_metadata_by_filename: dict) -> dict:
         "categories_unique_to_single_datasets": categories_unique_to_single_datasets,
     }
 
+def __extract_page_metadata(page: TiffPage, page_index: int) -> dict:
+    """Extracts the metadata and raw TIFF tags of one TIFF page.
+
+    Args:
+        page (TiffPage): The page to describe.
+        page_index (int): The index of the page in the file.
+
+    Returns:
+        dict: The page metadata.
+    """
+    page_data = {
+        'page_index': page_index,
+        'shape': page.shape,
+        'dtype': str(page.dtype),
+        'is_tiled': page.is_tiled,
+        'compression': page.compression,
+        'photometric': page.photometric,
+        'resolution': page.resolution,
+        'resolution_unit': page.resolutionunit,
+        'is_contiguous': page.is_contiguous,
+        'is_subsampled': page.is_subsampled,
+        'image_description': page.description,
+        # Raw TIFF tags for the current page
+        'page_tiff_tags': {}
+    }
+
+    for tag in page.tags.values():
+        try:
+            # Attempt to get a more structured representation if available
+            if hasattr(tag, 'value'):
+                tag_value = tag.value
+            elif hasattr(tag, 'asarray'): # For array-like tags
+                tag_value = tag.asarray().tolist()
+            else:
+                tag_value = repr(tag) # Fallback to representation
+            # Store the tag value in the page data
+            page_data['page_tiff_tags'][tag.name] = tag_value
+        except Exception as e:
+            page_data['page_tiff_tags'][tag.name] = f"Error reading tag: {e}"
+    return page_data
+
 def __extract_zgroup_metadata_recursive(zgroup: zarr.hierarchy.Group) -> dict:
     """Recursively extracts metadata from a Zarr group, including its attributes and children.
 
@@ -0,0 +1,224 @@
+import itertools
+import os
+import sys
+import numpy as np
+
+from concurrent.futures import ThreadPoolExecutor
+from timeit import default_timer as timer
+
+from utils.volume_dataset import VolumeDataset, ZarrVolumeDataset
+
+MAX_INDEX_WORKERS = os.cpu_count() or 4  # Threads reading chunks while building an index
+
+class OccupancyIndex:
+    """Per-chunk occupancy of a volume: which chunks hold only the background (fill) value,
+    the foreground fraction of each chunk and, for label volumes, the label IDs in each chunk.
+    Block iterators use it to skip empty chunks and to weight sampling toward foreground.
+    """
+
+    def __init__(self, shape: tuple, chunk_shape: tuple, background_value: object,
+                 foreground_fraction: np.ndarray, label_offsets: np.ndarray = None, label_ids: np.ndarray = None):
+        """
+        Args:
+            shape (tuple): The volume shape.
+            chunk_shape (tuple): The volume chunk shape.
+            background_value (object): The value counted as background (usually the fill value).
+            foreground_fraction (np.ndarray): The foreground fraction of each chunk, shaped like the chunk grid.
+            label_offsets (np.ndarray): For label volumes, where each chunk's labels start in `label_ids`
+                (chunks in C order, one extra trailing offset).
+            label_ids (np.ndarray): For label volumes, the concatenated sorted label IDs of all chunks.
+        """
+        self.shape = tuple(shape)
+        self.chunk_shape = tuple(chunk_shape)
+        self.background_value = background_value
+        self.foreground_fraction = foreground_fraction
+        self.label_offsets = label_offsets
+        self.label_ids = label_ids
+
+    @property
+    def grid_shape(self) -> tuple:
+        return self.foreground_fraction.shape
+
+    def is_empty(self, chunk_index: tuple) -> bool:
+        """Returns True if the chunk holds only the background value."""
+        return self.foreground_fraction[tuple(chunk_index)] == 0
+
+    def nonempty_chunks(self, min_foreground: float = 0.0) -> list:
+        """Returns the indices of the chunks whose foreground fraction exceeds `min_foreground`."""
+        return [tuple(int(i) for i in index) for index in np.argwhere(self.foreground_fraction > min_foreground)]
+
+    def labels_in_chunk(self, chunk_index: tuple) -> np.ndarray:
+        """Returns the sorted label IDs present in a chunk (label volumes only)."""
+        if self.label_ids is None:
+            raise ValueError("This occupancy index was built without label IDs.")
+        flat_index = np.ravel_multi_index(tuple(chunk_index), self.grid_shape)
+        return self.label_ids[self.label_offsets[flat_index]:self.label_offsets[flat_index + 1]]
+
+    def chunks_with_label(self, label_id: int) -> list:
+        """Returns the indices of the chunks containing a label ID (label volumes only)."""
+        if self.label_ids is None:
+            raise ValueError("This occupancy index was built without label IDs.")
+        positions = np.flatnonzero(self.label_ids == label_id)
+        flat_indices = np.searchsorted(self.label_offsets, positions, side="right") - 1
+        return [tuple(int(i) for i in np.unravel_index(f, self.grid_shape)) for f in flat_indices]
+
+    def iter_blocks(self, volume: VolumeDataset, min_foreground: float = 0.0):
+        """Yields (chunk_index, chunk data) for every chunk of the volume that is not empty,
+        so background chunks are never read.
+
+        Args:
+            volume (VolumeDataset): The volume the index was built for.
+            min_foreground (float): Chunks with a foreground fraction at or below this are skipped.
+        """
+        for chunk_index in self.nonempty_chunks(min_foreground):
+            yield chunk_index, volume.read_chunk(chunk_index)
+
+    def sample_block_starts(self, block_size: tuple, count: int, rng: np.random.Generator = None) -> list:
+        """Draws block origins, picking chunks with probability proportional to their foreground
+        fraction (empty chunks are never picked) and a uniform position inside the picked chunk.
+        Origins are moved back where needed so the whole block fits in the volume.
+
+        Args:
+            block_size (tuple): The block size, in array axis order.
+            count (int): The number of block origins to draw.
+            rng (np.random.Generator): The random generator to use.
+
+        Returns:
+            list: The block origins as tuples.
+        """
+        rng = rng or np.random.default_rng()
+        weights = self.foreground_fraction.ravel().astype(np.float64)
+        if weights.sum() == 0:
+            raise ValueError("The volume has no foreground to sample from.")
+        chosen = rng.choice(weights.size, size=count, p=weights / weights.sum())
+
+        starts = []
+        for flat_index in chosen:
+            chunk_index = np.unravel_index(flat_index, self.grid_shape)
+            start = []
+            for axis, (i, c, s) in enumerate(zip(chunk_index, self.chunk_shape, self.shape)):
+                size = block_size[axis] if axis < len(block_size) else s
+                position = int(rng.integers(i * c, min((i + 1) * c, s)))
+                start.append(max(0, min(position, s - size)))
+            starts.append(tuple(start[:len(block_size)]))
+        return starts
+
+    def summary(self) -> dict:
+        """Returns a JSON-serializable summary of the index."""
+        return {
+            "shape": list(self.shape),
+            "chunks": list(self.chunk_shape),
+            "grid_shape": list(self.grid_shape),
+            "total_chunks": int(self.foreground_fraction.size),
+            "empty_chunks": int(np.count_nonzero(self.foreground_fraction == 0)),
+            "mean_foreground_fraction": float(self.foreground_fraction.mean()),
+            "distinct_labels": int(np.unique(self.label_ids).size) if self.label_ids is not None else None,
+        }
+
+    def save(self, index_path: str) -> None:
+        """Saves the index to a .npz file."""
+        os.makedirs(os.path.dirname(index_path) or ".", exist_ok=True)
+        arrays = {
+            "shape": np.asarray(self.shape),
+            "chunk_shape": np.asarray(self.chunk_shape),
+            "background_value": np.asarray(self.background_value),
+            "foreground_fraction": self.foreground_fraction,
+        }
+        if self.label_ids is not None:
+            arrays["label_offsets"] = self.label_offsets
+            arrays["label_ids"] = self.label_ids
+        np.savez_compressed(index_path, **arrays)
+
+    @classmethod
+    def load(cls, index_path: str) -> "OccupancyIndex":
+        """Loads an index saved with save()."""
+        with np.load(index_path) as arrays:
+            return cls(
+                shape=tuple(int(s) for s in arrays["shape"]),
+                chunk_shape=tuple(int(c) for c in arrays["chunk_shape"]),
+                background_value=arrays["background_value"].item(),
+                foreground_fraction=arrays["foreground_fraction"],
+                label_offsets=arrays["label_offsets"] if "label_offsets" in arrays else None,
+                label_ids=arrays["label_ids"] if "label_ids" in arrays else None,
+            )
+
+def build_occupancy_index(volume: VolumeDataset, index_path: str, collect_labels: bool = None,
+                          background_value: object = None) -> OccupancyIndex:
+    """Builds the occupancy index of a volume in one parallel pass over its chunks and saves it.
+    For Zarr volumes, chunks missing from the store are known to hold only the fill value
+    and are not read at all. An existing index file is loaded instead of being rebuilt, unless
+    it was built for a different shape or chunk shape (e.g. an earlier download).
+
+    Args:
+        volume (VolumeDataset): The volume to index.
+        index_path (str): The path of the .npz index file.
+        collect_labels (bool): Whether to record the label IDs of each chunk. Defaults to True
+            for unsigned integer volumes of 32 bits or more (segmentations).
+        background_value (object): The value counted as background. Defaults to the volume fill value.
+
+    Returns:
+        OccupancyIndex: The occupancy index.
+    """
+    if os.path.exists(index_path):
+        try:
+            occupancy_index = OccupancyIndex.load(index_path)
+        except Exception as e:
+            print(f"Error loading occupancy index {index_path}: {e}. Rebuilding it.", file=sys.stderr)
+        else:
+            if occupancy_index.shape == tuple(volume.shape) and occupancy_index.chunk_shape == tuple(volume.chunk_shape):
+                print(f"Occupancy index {index_path} already exists. Skipping indexing.")
+                return occupancy_index
+            print(f"Occupancy index {index_path} was built for shape {occupancy_index.shape} and chunks "
+                  f"{occupancy_index.chunk_shape}, not {tuple(volume.shape)} and {tuple(volume.chunk_shape)}. Rebuilding it.")
+    else:
+        print(f"Occupancy index not found at {index_path}. Indexing chunks...")
+    start_time = timer()
+    dtype = np.dtype(volume.dtype)
+    if collect_labels is None:
+        collect_labels = dtype.kind == "u" and dtype.itemsize >= 4
+    if background_value is None:
+        background_value = volume.fill_value if volume.fill_value is not None else 0
+
+    grid_shape = tuple(-(-s // c) for s, c in zip(volume.shape, volume.chunk_shape))
+    all_chunks = list(itertools.product(*(range(n) for n in grid_shape)))
+    # Zarr chunks without a stored key hold only the fill value, so they are not read
+    stored_chunks = volume.stored_chunks() if isinstance(volume, ZarrVolumeDataset) else None
+    if stored_chunks is None:
+        stored_chunks = all_chunks
+    print(f"Reading {len(stored_chunks)} of {len(all_chunks)} chunks ({len(all_chunks) - len(stored_chunks)} not stored).")
+
+    # NaN never compares equal to itself, so a NaN background is matched with isnan
+    background_is_nan = np.asarray(background_value).dtype.kind == "f" and bool(np.isnan(background_value))
+
+    def index_chunk(chunk_index: tuple) -> tuple:
+        chunk = volume.read_chunk(chunk_index)
+        foreground = ~np.isnan(chunk) if background_is_nan else chunk != background_value
+        labels = np.unique(chunk[foreground]) if collect_labels else None
+        return chunk_index, np.count_nonzero(foreground) / chunk.size, labels
+
+    foreground_fraction = np.zeros(grid_shape, dtype=np.float32)
+    labels_by_chunk = {}
+    with ThreadPoolExecutor(max_workers=MAX_INDEX_WORKERS) as executor:
+        for chunk_index, fraction, labels in executor.map(index_chunk, stored_chunks):
+            foreground_fraction[chunk_index] = fraction
+            if labels is not None and labels.size:
+                labels_by_chunk[chunk_index] = labels
+
+    label_offsets, label_ids = None, None
+    if collect_labels:
+        counts = [labels_by_chunk[c].size if c in labels_by_chunk else 0 for c in all_chunks]
+        label_offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+        label_ids = (np.concatenate([labels_by_chunk[c] for c in all_chunks if c in labels_by_chunk])
+                     if labels_by_chunk else np.empty(0, dtype=dtype))
+
+    occupancy_index = OccupancyIndex(volume.shape, volume.chunk_shape, background_value,
+                                     foreground_fraction, label_offsets, label_ids)
+    try:
+        occupancy_index.save(index_path)
+        print(f"Occupancy index saved to {index_path}")
+    except Exception as e:
+        print(f"Error saving occupancy index to {index_path}: {e}", file=sys.stderr)
+
+    end_time = timer()
+    print(f"Occupancy indexing completed in {(end_time - start_time):.2f} seconds.")
+    return occupancy_index
@@ -0,0 +1,244 @@
+import os
+import sys
+import threading
+import numpy as np
+
+from timeit import default_timer as timer
+from zarr.storage import BaseStore, FSStore
+
+from utils.volume_dataset import VolumeDataset, ZarrVolumeDataset
+
+DEFAULT_CACHE_BYTES = 20 * 1024**3  # On-disk chunk cache size per dataset (20 GiB)
+EVICTION_TARGET_RATIO = 0.9  # A full cache is trimmed to this fraction of its size, so eviction runs rarely
+CACHE_CHECK_SECONDS = 10  # How often the size of a CloudVolume cache directory is measured while reading
+
+class DiskCachedStore(BaseStore):
+    """Read-only Zarr v2 store that fetches keys from a remote store on demand and keeps them
+    in a persistent local directory, evicting the least recently used files beyond `max_bytes`.
+
+    Missing chunks are fetched together through the remote store's `getitems`, which fsspec
+    filesystems (s3, gcs, http) serve with concurrent async requests.
+    """
+
+    def __init__(self, remote_store: BaseStore, cache_path: str, max_bytes: int = DEFAULT_CACHE_BYTES):
+        """
+        Args:
+            remote_store (BaseStore): The store holding the data, e.g. an FSStore on s3://.
+            cache_path (str): The local directory of the chunk cache (reused across runs).
+            max_bytes (int): The maximum size of the cache directory.
+        """
+        self.remote_store = remote_store
+        self.cache_path = cache_path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._missing_keys = set()  # Keys known to be absent remotely (e.g. empty chunks)
+        self._lock = threading.Lock()
+        os.makedirs(cache_path, exist_ok=True)
+        self.current_bytes = sum(size for _, size, _ in self._cached_files())
+
+    def __getitem__(self, key: str) -> bytes:
+        results = self.getitems([key], contexts={})
+        if key not in results:
+            raise KeyError(key)
+        return results[key]
+
+    def getitems(self, keys: list, *, contexts: dict) -> dict:
+        """Returns the values of the keys present in the store, reading cached keys from disk
+        and fetching the others from the remote store in one concurrent batch.
+        """
+        results, to_fetch = {}, []
+        for key in keys:
+            if key in self._missing_keys:
+                continue
+            try:
+                with open(self._cache_file(key), "rb") as cached_file:
+                    results[key] = cached_file.read()
+                os.utime(self._cache_file(key))  # Mark as recently used
+                self.hits += 1
+            except FileNotFoundError:
+                to_fetch.append(key)
+
+        if to_fetch:
+            self.misses += len(to_fetch)
+            # Remote errors other than missing keys (timeouts, connection resets) are raised by the
+            # remote store, so only keys that are really absent are left out of `fetched`
+            fetched = self.remote_store.getitems(to_fetch, contexts=contexts)
+            for key in to_fetch:
+                if key in fetched:
+                    results[key] = bytes(fetched[key])
+                    self._store_in_cache(key, results[key])
+                else:
+                    self._missing_keys.add(key)
+            self._evict()
+        return results
+
+    def __contains__(self, key: str) -> bool:
+        if key in self._missing_keys:
+            return False
+        return os.path.exists(self._cache_file(key)) or key in self.remote_store
+
+    def __setitem__(self, key: str, value: bytes) -> None:
+        raise PermissionError("DiskCachedStore is read-only.")
+
+    def __delitem__(self, key: str) -> None:
+        raise PermissionError("DiskCachedStore is read-only.")
+
+    def __iter__(self):
+        return iter(self.remote_store)
+
+    def __len__(self) -> int:
+        return len(self.remote_store)
+
+    def listdir(self, path: str = "") -> list:
+        return self.remote_store.listdir(path)
+
+    def stats(self) -> dict:
+        """Returns the cache usage counters."""
+        return {
+            "max_bytes": self.max_bytes,
+            "current_bytes": self.current_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def _cache_file(self, key: str) -> str:
+        """Maps a store key (e.g. 's0/0.1.2') to its file in the cache directory."""
+        return os.path.join(self.cache_path, *key.split("/"))
+
+    def _store_in_cache(self, key: str, value: bytes) -> None:
+        """Writes a fetched value to the cache directory. The write goes to a temporary file
+        first, so other processes sharing the cache never see partial files."""
+        cache_file = self._cache_file(key)
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        temporary_file = f"{cache_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporary_file, "wb") as file:
+            file.write(value)
+        os.replace(temporary_file, cache_file)
+        with self._lock:
+            self.current_bytes += len(value)
+
+    def _evict(self) -> None:
+        """Deletes the least recently used cached files until the cache fits in `max_bytes`."""
+        with self._lock:
+            if self.current_bytes <= self.max_bytes:
+                return
+            self.current_bytes = evict_disk_cache(self.cache_path, self.max_bytes)
+
+    def _cached_files(self) -> list:
+        return _list_cached_files(self.cache_path)
+
+class PrecomputedVolumeDataset(VolumeDataset):
+    """Lazy block-wise access to a remote Neuroglancer precomputed volume through CloudVolume.
+    Only the chunks (or shards) a block touches are downloaded; CloudVolume keeps them in
+    `cache_path`. CloudVolume does not report what it downloaded, so the size of the cache
+    directory is measured at most every CACHE_CHECK_SECONDS during reads and trimmed when it
+    exceeds `max_bytes`; between checks it can outgrow `max_bytes` by what was downloaded since.
+    CloudVolume does not refresh the modification time of files it reads from its cache, so the
+    oldest downloads are evicted first rather than the least recently used ones.
+    """
+
+    def __init__(self, cloudpath: str, cache_path: str, max_bytes: int = DEFAULT_CACHE_BYTES, mip: int = 0):
+        """
+        Args:
+            cloudpath (str): The precomputed volume URL, e.g. "gs://bucket/path/".
+            cache_path (str): The local directory of the chunk cache (reused across runs).
+            max_bytes (int): The maximum size of the cache directory.
+            mip (int): The resolution level to read.
+        """
+        from cloudvolume import CloudVolume  # Only needed for precomputed volumes
+
+        self.volume = CloudVolume(cloudpath, mip=mip, cache=cache_path, fill_missing=True, progress=False)
+        self.cache_path = cache_path
+        self.max_bytes = max_bytes
+        self.offset = tuple(int(v) for v in self.volume.voxel_offset) + (0,)
+        self.shape = tuple(int(v) for v in self.volume.shape)
+        self.dtype = np.dtype(self.volume.dtype)
+        self.chunk_shape = tuple(int(v) for v in self.volume.chunk_size) + (int(self.volume.num_channels),)
+        self.fill_value = 0
+        self.current_bytes = evict_disk_cache(cache_path, max_bytes)
+        self._last_cache_check = timer()
+        self._lock = threading.Lock()
+
+    def _read_region(self, region: tuple) -> np.ndarray:
+        # CloudVolume indexes in global (x, y, z, channel) coordinates, so shift by the voxel offset
+        shifted = tuple(slice(r.start + o, r.stop + o) for r, o in zip(region, self.offset))
+        block = np.asarray(self.volume[shifted])
+        # Walking the cache directory measures what CloudVolume actually downloaded (whole
+        # compressed chunks or shard pieces, whatever the block size), so it runs on a schedule
+        with self._lock:
+            if timer() - self._last_cache_check >= CACHE_CHECK_SECONDS:
+                self.current_bytes = evict_disk_cache(self.cache_path, self.max_bytes)
+                self._last_cache_check = timer()
+        return block
+
+def open_remote_zarr(url: str, cache_path: str, array_path: str = None,
+                     max_bytes: int = DEFAULT_CACHE_BYTES, storage_options: dict = None) -> ZarrVolumeDataset:
+    """Opens a remote Zarr array for lazy block-wise reads through a persistent on-disk chunk cache.
+
+    Args:
+        url (str): The Zarr container URL (s3://, gs://, http(s):// or a local directory).
+        cache_path (str): The local directory of the chunk cache (reused across runs).
+        array_path (str): The path of the array inside the container, required when the root is a group.
+        max_bytes (int): The maximum size of the cache directory.
+        storage_options (dict): Options passed to the fsspec filesystem, e.g. {"anon": True} for public S3.
+
+    Returns:
+        ZarrVolumeDataset: The volume, reading chunks on demand.
+    """
+    print(f"Opening remote Zarr container {url} (chunk cache at {cache_path})...")
+    start_time = timer()
+    # Only missing keys may read as absent; other errors (e.g. timeouts) must not become fill-value chunks
+    remote_store = FSStore(url, mode='r', exceptions=(KeyError,), **(storage_options or {}))
+    volume = ZarrVolumeDataset(DiskCachedStore(remote_store, cache_path, max_bytes), array_path)
+    end_time = timer()
+    print(f"Remote Zarr container opened in {(end_time - start_time):.2f} seconds.")
+    return volume
+
+def evict_disk_cache(cache_path: str, max_bytes: int) -> int:
+    """Deletes the oldest files of a cache directory once it exceeds `max_bytes`, down to
+    EVICTION_TARGET_RATIO of it. Files are ordered by modification time: DiskCachedStore refreshes
+    it on cache hits, making eviction least recently used, while CloudVolume caches evict by download time.
+
+    Args:
+        cache_path (str): The cache directory.
+        max_bytes (int): The maximum size of the cache directory.
+
+    Returns:
+        int: The size of the cache directory after eviction.
+    """
+    cached_files = _list_cached_files(cache_path)
+    total_bytes = sum(size for _, size, _ in cached_files)
+    if total_bytes <= max_bytes:
+        return total_bytes
+    target_bytes = int(max_bytes * EVICTION_TARGET_RATIO)
+    for file_path, size, _ in sorted(cached_files, key=lambda entry: entry[2]):
+        if total_bytes <= target_bytes:
+            break
+        try:
+            os.remove(file_path)
+            total_bytes -= size
+        except FileNotFoundError:
+            pass  # Already evicted by another process sharing the cache
+        except OSError as e:
+            print(f"Error evicting {file_path} from chunk cache: {e}", file=sys.stderr)
+    return total_bytes
+
+def _list_cached_files(cache_path: str) -> list:
+    """Lists the files of a cache directory.
+
+    Returns:
+        list: (file path, size in bytes, modification time) tuples.
+    """
+    cached_files = []
+    for root, _, files in os.walk(cache_path):
+        for file_name in files:
+            if file_name.endswith(".tmp"):
+                continue
+            file_path = os.path.join(root, file_name)
+            try:
+                file_stat = os.stat(file_path)
+            except FileNotFoundError:
+                continue
+            cached_files.append((file_path, file_stat.st_size, file_stat.st_mtime))
+    return cached_files
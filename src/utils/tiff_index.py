@@ -0,0 +1,292 @@
+import mmap
+import os
+import struct
+import sys
+import numpy as np
+
+from concurrent.futures import ThreadPoolExecutor
+from timeit import default_timer as timer
+from tifffile import TiffFile, TiffPage
+
+MAX_SCAN_WORKERS = os.cpu_count() or 4  # Threads parsing IFD ranges
+PAGES_PER_SCAN_TASK = 4096  # Maximum IFDs parsed together with numpy in one task
+SCAN_TASK_BYTES = 32 * 1024**2  # Approximate memory of one task; pages with many strips get smaller tasks
+SCAN_BYTES_PER_SEGMENT = 48  # Memory used per strip or tile while parsing (raw values, int64 copies, results)
+GATHER_INDEX_MAX_BYTES = 64  # Longer tag values are copied by slicing instead of with a fancy index
+
+DATA_OFFSET_TAGS = (273, 324)  # StripOffsets, TileOffsets
+DATA_BYTECOUNT_TAGS = (279, 325)  # StripByteCounts, TileByteCounts
+# Byte size of each TIFF tag data type
+TIFF_TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 6: 1, 7: 1, 8: 2, 9: 4, 10: 8, 11: 4, 12: 8, 13: 4, 16: 8, 17: 8, 18: 8}
+TIFF_INTEGER_TYPES = {3: "u2", 4: "u4", 13: "u4", 16: "u8"}
+
+class TiffPageIndex:
+    """Location of every page (IFD) of a TIFF file: its strip or tile offsets and byte counts,
+    and the runs of consecutive pages sharing the same tags (apart from those offsets).
+    Each run refers to a keyframe, the first page with its tags, so tags only need to be
+    parsed once per keyframe. For uncompressed pages the offsets allow direct block reads.
+    """
+
+    def __init__(self, ifd_offsets: np.ndarray, data_offsets: np.ndarray, data_bytecounts: np.ndarray,
+                 page_groups: np.ndarray):
+        """
+        Args:
+            ifd_offsets (np.ndarray): The file offset of each page IFD.
+            data_offsets (np.ndarray): The strip or tile offsets of each page, shaped (pages, segments).
+                Pages with fewer segments are padded with -1.
+            data_bytecounts (np.ndarray): The strip or tile byte counts, shaped like `data_offsets` (padded with 0).
+            page_groups (np.ndarray): The runs of pages sharing the same tags, as (first page,
+                stop page, keyframe page) rows.
+        """
+        self.ifd_offsets = ifd_offsets
+        self.data_offsets = data_offsets
+        self.data_bytecounts = data_bytecounts
+        self.page_groups = page_groups
+
+    @property
+    def page_count(self) -> int:
+        return len(self.ifd_offsets)
+
+    @property
+    def is_uniform(self) -> bool:
+        """True if every page has the same tags as the first one."""
+        return bool(np.all(self.page_groups[:, 2] == 0))
+
+    def keyframes(self) -> list:
+        """Returns the index of the first page of each distinct set of tags."""
+        return [int(k) for k in np.unique(self.page_groups[:, 2])]
+
+    def read_pages(self, file_path: str, start: int, stop: int, page_shape: tuple, dtype: np.dtype) -> np.ndarray:
+        """Reads uncompressed pages directly from their offsets, without decoding any tags.
+        Adjacent segments are merged, so a contiguous stack is read with one call.
+
+        Args:
+            file_path (str): The path to the TIFF file.
+            start (int): The first page to read.
+            stop (int): The page after the last one to read.
+            page_shape (tuple): The shape of one page.
+            dtype (np.dtype): The stored data type, including the file byte order.
+
+        Returns:
+            np.ndarray: The pages, shaped (stop - start,) + page_shape.
+        """
+        pages = np.empty((stop - start,) + tuple(page_shape), dtype=dtype)
+        offsets = self.data_offsets[start:stop].ravel()
+        bytecounts = self.data_bytecounts[start:stop].ravel()
+        offsets, bytecounts = offsets[bytecounts > 0], bytecounts[bytecounts > 0]
+        if int(bytecounts.sum()) != pages.nbytes:
+            raise ValueError(f"Pages {start}-{stop} of {file_path} are compressed or do not match shape {page_shape}.")
+
+        # Start a new read wherever a segment does not directly follow the previous one
+        run_starts = np.concatenate(([0], np.flatnonzero(offsets[1:] != offsets[:-1] + bytecounts[:-1]) + 1))
+        run_bytes = np.add.reduceat(bytecounts, run_starts) if len(offsets) else []
+        target = memoryview(pages.reshape(-1).view(np.uint8))
+        position = 0
+        with open(file_path, "rb") as file:
+            for run_offset, size in zip(offsets[run_starts], run_bytes):
+                file.seek(int(run_offset))
+                file.readinto(target[position:position + int(size)])
+                position += int(size)
+        return pages
+
+    def save(self, index_path: str) -> None:
+        """Saves the index to a .npz file."""
+        os.makedirs(os.path.dirname(index_path) or ".", exist_ok=True)
+        np.savez_compressed(index_path, ifd_offsets=self.ifd_offsets, data_offsets=self.data_offsets,
+                            data_bytecounts=self.data_bytecounts, page_groups=self.page_groups)
+
+    @classmethod
+    def load(cls, index_path: str) -> "TiffPageIndex":
+        """Loads an index saved with save()."""
+        with np.load(index_path) as arrays:
+            return cls(arrays["ifd_offsets"], arrays["data_offsets"], arrays["data_bytecounts"], arrays["page_groups"])
+
+def scan_tiff_pages(file_path: str, index_path: str = None, max_workers: int = MAX_SCAN_WORKERS) -> TiffPageIndex:
+    """Indexes the pages of a TIFF file by reading their IFDs directly. The IFD chain is followed
+    reading only tag counts and next-IFD offsets; the tag entries are then parsed with numpy, in
+    ranges of pages spread over threads. Ranges hold at most PAGES_PER_SCAN_TASK pages and are
+    shortened for pages with many strips, so a task uses about SCAN_TASK_BYTES. No per-page tag
+    objects are built.
+
+    Args:
+        file_path (str): The path to the TIFF file.
+        index_path (str): Optional .npz file to save the index to. An existing file is loaded instead.
+        max_workers (int): The number of threads parsing IFD ranges (1 to scan sequentially).
+
+    Returns:
+        TiffPageIndex: The page index.
+    """
+    if index_path is not None and os.path.exists(index_path):
+        print(f"TIFF page index {index_path} already exists. Skipping scan.")
+        return TiffPageIndex.load(index_path)
+
+    start_time = timer()
+    with TiffFile(file_path) as tif:
+        tiff_format = tif.tiff
+        first_ifd = tif.pages.first.offset
+        segment_count = max(1, len(tif.pages.first.dataoffsets))
+
+    with open(file_path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        ifd_offsets = _walk_ifd_chain(buffer, tiff_format, first_ifd)
+        data = np.frombuffer(buffer, dtype=np.uint8)
+        pages_per_task = max(1, min(PAGES_PER_SCAN_TASK, SCAN_TASK_BYTES // (segment_count * SCAN_BYTES_PER_SEGMENT)))
+        ranges = [ifd_offsets[i:i + pages_per_task] for i in range(0, len(ifd_offsets), pages_per_task)]
+
+        # Results are copied into the index as they arrive, sized for the first page's segments
+        data_offsets = np.full((len(ifd_offsets), segment_count), -1, dtype=np.int64)
+        data_bytecounts = np.zeros((len(ifd_offsets), segment_count), dtype=np.int64)
+        signature_ids, signatures = np.empty(len(ifd_offsets), dtype=np.int64), {}
+        position = 0
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            for offsets, bytecounts, page_signatures in executor.map(
+                    lambda offsets: _parse_ifd_range(data, tiff_format, offsets), ranges):
+                if offsets.shape[1] > data_offsets.shape[1]:
+                    extra_columns = ((0, 0), (0, offsets.shape[1] - data_offsets.shape[1]))
+                    data_offsets = np.pad(data_offsets, extra_columns, constant_values=-1)
+                    data_bytecounts = np.pad(data_bytecounts, extra_columns, constant_values=0)
+                data_offsets[position:position + len(offsets), :offsets.shape[1]] = offsets
+                data_bytecounts[position:position + len(offsets), :bytecounts.shape[1]] = bytecounts
+                for signature in page_signatures:
+                    signature_ids[position] = signatures.setdefault(signature, len(signatures))
+                    position += 1
+        del data  # Release the buffer export so the mmap can be closed
+
+    # Runs of consecutive pages with the same signature, each pointing at its keyframe
+    _, keyframe_by_signature = np.unique(signature_ids, return_index=True)
+    run_starts = np.concatenate(([0], np.flatnonzero(signature_ids[1:] != signature_ids[:-1]) + 1))
+    run_stops = np.append(run_starts[1:], len(signature_ids))
+    page_groups = np.stack([run_starts, run_stops, keyframe_by_signature[signature_ids[run_starts]]], axis=1)
+
+    page_index = TiffPageIndex(ifd_offsets, data_offsets, data_bytecounts, page_groups.astype(np.int64))
+    end_time = timer()
+    print(f"Scanned {page_index.page_count} pages of {file_path} ({len(signatures)} distinct tag sets) "
+          f"in {(end_time - start_time):.2f} seconds.")
+
+    if index_path is not None:
+        try:
+            page_index.save(index_path)
+            print(f"TIFF page index saved to {index_path}")
+        except Exception as e:
+            print(f"Error saving TIFF page index to {index_path}: {e}", file=sys.stderr)
+    return page_index
+
+def read_keyframes(tif: TiffFile, page_index: TiffPageIndex) -> dict:
+    """Parses only the keyframes of an indexed TIFF file into full tifffile pages.
+
+    Args:
+        tif (TiffFile): The open TIFF file.
+        page_index (TiffPageIndex): The page index of the file.
+
+    Returns:
+        dict: Maps each keyframe index to its TiffPage.
+    """
+    keyframes = {}
+    for keyframe in page_index.keyframes():
+        # TiffPage parses the IFD at the current file position
+        tif.filehandle.seek(int(page_index.ifd_offsets[keyframe]))
+        keyframes[keyframe] = TiffPage(tif, index=keyframe)
+    return keyframes
+
+def _walk_ifd_chain(buffer: mmap.mmap, tiff_format: object, first_ifd: int) -> np.ndarray:
+    """Follows the next-IFD offsets from the first IFD, reading only the tag count of each IFD."""
+    tag_count_format, offset_format = tiff_format.tagnoformat, tiff_format.offsetformat
+    ifd_offsets, seen = [], set()
+    offset = first_ifd
+    while offset and offset not in seen:
+        if offset + tiff_format.tagnosize > len(buffer):
+            print(f"Invalid IFD offset {offset}. Stopping the page scan.", file=sys.stderr)
+            break
+        seen.add(offset)
+        ifd_offsets.append(offset)
+        tag_count = struct.unpack_from(tag_count_format, buffer, offset)[0]
+        next_pointer = offset + tiff_format.tagnosize + tag_count * tiff_format.tagsize
+        if next_pointer + tiff_format.offsetsize > len(buffer):
+            break
+        offset = struct.unpack_from(offset_format, buffer, next_pointer)[0]
+    return np.asarray(ifd_offsets, dtype=np.int64)
+
+def _parse_ifd_range(data: np.ndarray, tiff_format: object, ifd_offsets: np.ndarray) -> tuple:
+    """Parses the tag entries of a range of IFDs with vectorized numpy gathers. IFDs with the
+    same tag codes, types and counts are parsed together, one tag column at a time.
+
+    Returns:
+        tuple: The data offsets and byte counts, shaped (pages, segments), and the signature
+            (bytes of every tag except the data offsets and byte counts) of each page.
+    """
+    byte_order, value_size = tiff_format.byteorder, tiff_format.offsetsize
+    entry_dtype = np.dtype([("code", f"{byte_order}u2"), ("type", f"{byte_order}u2"),
+                            ("count", f"{byte_order}u{value_size}"), ("value", f"V{value_size}")])
+    pointer_dtype = np.dtype(f"{byte_order}u{value_size}")
+    tag_counts = _gather(data, ifd_offsets, tiff_format.tagnosize).view(np.dtype(tiff_format.tagnoformat)).ravel()
+
+    parsed_layouts, signatures = [], np.empty(len(ifd_offsets), dtype=object)
+    for tag_count in np.unique(tag_counts):
+        same_count = np.flatnonzero(tag_counts == tag_count)
+        entries = _gather(data, ifd_offsets[same_count] + tiff_format.tagnosize,
+                          int(tag_count) * tiff_format.tagsize).view(entry_dtype)
+        layouts = np.concatenate([entries["code"], entries["type"], entries["count"]], axis=1).astype(np.int64)
+        first_of_layout, layout_ids = _unique_rows(layouts)
+
+        for layout_id, layout in enumerate(layouts[first_of_layout]):
+            in_layout = layout_ids == layout_id
+            rows, layout_entries = same_count[in_layout], entries[in_layout]
+            offsets = bytecounts = np.empty((len(rows), 0), dtype=np.int64)
+            contents = []
+            for column in range(int(tag_count)):
+                code, tag_type, count = (int(layout_entries[field][0, column]) for field in ("code", "type", "count"))
+                size = count * TIFF_TYPE_SIZES.get(tag_type, 1)
+                values = np.ascontiguousarray(layout_entries["value"][:, column])
+                if size <= value_size:
+                    content = np.ascontiguousarray(values.view(np.uint8).reshape(len(rows), -1)[:, :size])
+                else:
+                    content = _gather(data, values.view(pointer_dtype).astype(np.int64), size)
+                if code in DATA_OFFSET_TAGS + DATA_BYTECOUNT_TAGS:
+                    integers = content.view(np.dtype(byte_order + TIFF_INTEGER_TYPES.get(tag_type, "u4"))).astype(np.int64)
+                    if code in DATA_OFFSET_TAGS:
+                        offsets = integers
+                    else:
+                        bytecounts = integers
+                else:
+                    contents.append(content)
+
+            # Pages with identical tag contents share a signature
+            signature_rows = np.concatenate(contents, axis=1) if contents else np.empty((len(rows), 0), np.uint8)
+            first_of_row, row_ids = _unique_rows(signature_rows)
+            keys = np.array([layout.tobytes() + row.tobytes() for row in signature_rows[first_of_row]], dtype=object)
+            signatures[rows] = keys[row_ids]
+            parsed_layouts.append((rows, offsets, bytecounts))
+
+    segment_count = max(offsets.shape[1] for _, offsets, _ in parsed_layouts)
+    offsets_array = np.full((len(ifd_offsets), segment_count), -1, dtype=np.int64)
+    bytecounts_array = np.zeros((len(ifd_offsets), segment_count), dtype=np.int64)
+    for rows, offsets, bytecounts in parsed_layouts:
+        offsets_array[rows, :offsets.shape[1]] = offsets
+        bytecounts_array[rows, :bytecounts.shape[1]] = bytecounts
+    return offsets_array, bytecounts_array, signatures
+
+def _unique_rows(rows: np.ndarray) -> tuple:
+    """Groups identical rows of a 2D array. Rows are grouped by a 64-bit fingerprint, which is much
+    faster than sorting whole rows; the grouping is then checked against the rows themselves.
+
+    Returns:
+        tuple: The index of the first row of each group, and the group of each row.
+    """
+    words = np.zeros((len(rows), -(-rows.shape[1] * rows.itemsize // 8)), dtype=np.uint64)
+    words.view(np.uint8)[:, :rows.shape[1] * rows.itemsize] = np.ascontiguousarray(rows).view(np.uint8)
+    weights = np.random.default_rng(0).integers(1, 2**63, words.shape[1], dtype=np.uint64)
+    fingerprints = (words * weights).sum(axis=1, dtype=np.uint64)  # Wraps around modulo 2**64
+    _, first, inverse = np.unique(fingerprints, return_index=True, return_inverse=True)
+    if not np.array_equal(rows, rows[first[inverse]]):  # Fingerprint collision: sort the whole rows
+        _, first, inverse = np.unique(rows, axis=0, return_index=True, return_inverse=True)
+    return first, inverse.ravel()
+
+def _gather(data: np.ndarray, starts: np.ndarray, size: int) -> np.ndarray:
+    """Reads `size` bytes at each start offset, as a (len(starts), size) uint8 array."""
+    starts = np.asarray(starts, dtype=np.int64)
+    if size <= GATHER_INDEX_MAX_BYTES:
+        return data[starts[:, np.newaxis] + np.arange(size)]
+    # Long values (e.g. the strip offsets of tall pages) are sliced, as a fancy index would take 8 bytes per byte read
+    gathered = np.empty((len(starts), size), dtype=np.uint8)
+    for row, start in enumerate(starts.tolist()):
+        gathered[row] = data[start:start + size]
+    return gathered
@@ -0,0 +1,271 @@
+import abc
+import os
+import sys
+import threading
+import numpy as np
+import requests
+import zarr
+
+from tifffile import TiffFile
+
+from utils.tiff_index import scan_tiff_pages
+
+DEFAULT_BLOCK_SIZE = (128, 128, 128)  # Default block size (in array axis order) returned by get_block
+
+class VolumeDataset(abc.ABC):
+    """Common block-wise access interface for 3D volumes (see docs/DATA_ACCESS_DESIGN.md).
+
+    Coordinates and sizes are given in the axis order of the stored array. When fewer values
+    than array dimensions are given, the remaining (trailing) axes are returned in full.
+    Blocks reaching past the volume bounds are clipped, so edge blocks may be smaller.
+    """
+
+    shape: tuple = ()
+    dtype: np.dtype = None
+    chunk_shape: tuple = ()
+    fill_value: object = 0
+
+    def get_block(self, start: tuple, block_size: tuple = DEFAULT_BLOCK_SIZE) -> np.ndarray:
+        """Returns the block of the volume starting at `start` with size `block_size`.
+
+        Args:
+            start (tuple): The block origin, in array axis order.
+            block_size (tuple): The block size, in array axis order.
+
+        Returns:
+            np.ndarray: The block data.
+        """
+        return self._read_region(self.block_region(start, block_size))
+
+    def read_chunk(self, chunk_index: tuple) -> np.ndarray:
+        """Returns the stored chunk at the given chunk grid index, the natural unit of decoding.
+
+        Args:
+            chunk_index (tuple): The chunk index along each axis.
+
+        Returns:
+            np.ndarray: The chunk data (edge chunks are clipped to the volume bounds).
+        """
+        region = tuple(
+            slice(i * c, min((i + 1) * c, s))
+            for i, c, s in zip(chunk_index, self.chunk_shape, self.shape)
+        )
+        return self._read_region(region)
+
+    def get_metadata(self) -> dict:
+        """Returns a metadata dictionary for the volume.
+
+        Returns:
+            dict: The volume shape, dtype, chunk shape and fill value.
+        """
+        return {
+            "shape": list(self.shape),
+            "dtype": str(self.dtype),
+            "chunks": list(self.chunk_shape),
+            "fill_value": self.fill_value.item() if isinstance(self.fill_value, np.generic) else self.fill_value,
+        }
+
+    def close(self) -> None:
+        """Releases any open file handles."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def block_region(self, start: tuple, block_size: tuple) -> tuple:
+        """Converts a block origin and size to a tuple of slices (one per axis) clipped to the volume bounds.
+
+        Args:
+            start (tuple): The block origin, in array axis order.
+            block_size (tuple): The block size, in array axis order.
+
+        Returns:
+            tuple: One slice per array axis.
+        """
+        if len(start) != len(block_size) or len(start) > len(self.shape):
+            raise ValueError(f"Block start {start} and size {block_size} do not match volume shape {self.shape}.")
+        region = []
+        for axis, axis_length in enumerate(self.shape):
+            if axis < len(start):
+                if start[axis] < 0 or start[axis] >= axis_length:
+                    raise IndexError(f"Block start {start} is outside volume shape {self.shape}.")
+                if block_size[axis] <= 0:
+                    raise ValueError(f"Block size {block_size} must be positive along every axis.")
+                region.append(slice(start[axis], min(start[axis] + block_size[axis], axis_length)))
+            else:
+                region.append(slice(0, axis_length))
+        return tuple(region)
+
+    @abc.abstractmethod
+    def _read_region(self, region: tuple) -> np.ndarray:
+        """Reads a region given as a tuple of slices (one per axis)."""
+
+class ZarrVolumeDataset(VolumeDataset):
+    """Block-wise access to an array of a Zarr container."""
+
+    def __init__(self, file_path: object, array_path: str = None):
+        """Opens a Zarr array for reading.
+
+        Args:
+            file_path (object): The path to a local Zarr container, or a Zarr store (see utils/remote_store.py).
+            array_path (str): The path of the array inside the container, required when the root is a group.
+        """
+        if isinstance(file_path, str) and not os.path.exists(file_path):
+            raise FileNotFoundError(f"File {file_path} not found. Pull it from DVC store by running 'dvc pull'.")
+
+        zarr_content = zarr.open(file_path, mode='r')
+        if isinstance(zarr_content, zarr.hierarchy.Group):
+            if array_path is None:
+                raise ValueError(f"{file_path} is a Zarr group. Choose one of its arrays with array_path.")
+            zarr_content = zarr_content[array_path]
+        if not isinstance(zarr_content, zarr.core.Array):
+            raise ValueError(f"No Zarr array found at {file_path} ({array_path}).")
+
+        self.zarray = zarr_content
+        self.shape = tuple(zarr_content.shape)
+        self.dtype = zarr_content.dtype
+        self.chunk_shape = tuple(zarr_content.chunks)
+        self.fill_value = zarr_content.fill_value if zarr_content.fill_value is not None else 0
+
+    def stored_chunks(self) -> list:
+        """Lists the chunks with a stored key; the others hold only the fill value.
+
+        Returns:
+            list: The sorted chunk indices, or None if the store cannot list its keys.
+        """
+        return list_stored_chunks(self.zarray)
+
+    def _read_region(self, region: tuple) -> np.ndarray:
+        return self.zarray[region]
+
+class TiffVolumeDataset(VolumeDataset):
+    """Block-wise access to the first series of a local (multi-page) TIFF file.
+    Each page is a chunk, so a block only reads the pages it spans. Uncompressed stacks
+    are read directly from the page offsets of a TiffPageIndex, without decoding page tags.
+    """
+
+    def __init__(self, file_path: str, index_path: str = None):
+        """Opens a TIFF file for reading. The file stays open until close() is called.
+
+        Args:
+            file_path (str): The path to the TIFF file.
+            index_path (str): Optional .npz page index of the file (see utils/tiff_index.py),
+                loaded if it exists and saved there otherwise.
+        """
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"File {file_path} not found. Pull it from DVC store by running 'dvc pull'.")
+
+        self.tif = TiffFile(file_path)
+        self.series = self.tif.series[0]
+        self.shape = tuple(self.series.shape)
+        self.dtype = self.series.dtype
+        self.chunk_shape = self.shape if len(self.shape) == 2 else (1,) + self.shape[1:]
+        self.fill_value = 0
+        self._lock = threading.Lock()  # TiffFile shares one file handle between reads
+
+        self.file_path = file_path
+        self.page_index = None
+        keyframe = self.series.keyframe
+        # Only uncompressed strips hold the page rows in order; tiles would be copied as if they were rows
+        if (len(self.shape) == 3 and keyframe.compression == 1 and not keyframe.is_tiled
+                and keyframe.bitspersample == self.dtype.itemsize * 8):
+            page_index = scan_tiff_pages(file_path, index_path)
+            page_bytes = int(np.prod(self.shape[1:])) * self.dtype.itemsize
+            if page_index.page_count == self.shape[0] and np.all(page_index.data_bytecounts.sum(axis=1) == page_bytes):
+                self.page_index = page_index
+
+    def close(self) -> None:
+        self.tif.close()
+
+    def _read_region(self, region: tuple) -> np.ndarray:
+        if self.page_index is not None:
+            stored_dtype = self.dtype.newbyteorder(self.tif.byteorder)
+            pages = self.page_index.read_pages(self.file_path, region[0].start, region[0].stop, self.shape[1:], stored_dtype)
+            return pages.astype(self.dtype, copy=False)[(slice(None),) + region[1:]]
+        with self._lock:
+            if len(self.shape) == 2:
+                return self.series.asarray()[region]
+            pages = self.series.asarray(key=range(region[0].start, region[0].stop))
+        return pages.reshape((-1,) + self.shape[1:])[(slice(None),) + region[1:]]
+
+class HttpVolumeDataset(VolumeDataset):
+    """Block-wise access to a volume served by a local chunk server (see utils/chunk_server.py).
+    Blocks are assembled from the server's shared decoded-chunk cache, and the HTTP session
+    keeps its connection alive between requests.
+    """
+
+    def __init__(self, server_url: str, volume_name: str):
+        """Fetches the volume metadata from the server.
+
+        Args:
+            server_url (str): The server base URL, e.g. "http://127.0.0.1:8765".
+            volume_name (str): The registered volume name.
+        """
+        self.volume_url = f"{server_url.rstrip('/')}/volumes/{volume_name}"
+        self.session = requests.Session()
+        self.metadata = self._get(f"{self.volume_url}/metadata").json()
+        self.shape = tuple(self.metadata["shape"])
+        self.dtype = np.dtype(self.metadata["dtype"])
+        self.chunk_shape = tuple(self.metadata["chunks"])
+        self.fill_value = self.metadata["fill_value"]
+
+    def get_metadata(self) -> dict:
+        return dict(self.metadata)
+
+    def close(self) -> None:
+        self.session.close()
+
+    def _read_region(self, region: tuple) -> np.ndarray:
+        start = ",".join(str(r.start) for r in region)
+        size = ",".join(str(r.stop - r.start) for r in region)
+        response = self._get(f"{self.volume_url}/block", params={"start": start, "size": size})
+        block_shape = tuple(int(s) for s in response.headers["X-Block-Shape"].split(","))
+        return np.frombuffer(response.content, dtype=response.headers["X-Block-Dtype"]).reshape(block_shape)
+
+    def _get(self, url: str, params: dict = None) -> requests.Response:
+        """Sends a GET request and raises on HTTP errors."""
+        response = self.session.get(url, params=params)
+        response.raise_for_status()  # Raise HTTP errors
+        return response
+
+def list_stored_chunks(zarray: zarr.core.Array) -> list:
+    """Lists the chunk indices of a Zarr array that have a stored key.
+
+    Args:
+        zarray (zarr.core.Array): The array.
+
+    Returns:
+        list: The sorted chunk indices inside the chunk grid, or None if the store cannot list its keys.
+    """
+    chunk_store = zarray.chunk_store
+    if not hasattr(chunk_store, "listdir"):
+        return None
+    separator = getattr(zarray, "_dimension_separator", None) or "."
+    try:
+        if separator == "/":
+            # Nested keys (e.g. '0/1/2'): list one directory level per axis
+            stored_keys = [""]
+            for _ in range(zarray.ndim):
+                stored_keys = [
+                    f"{key}/{name}" if key else name
+                    for key in stored_keys
+                    for name in chunk_store.listdir("/".join(filter(None, [zarray.path, key])))
+                    if name.isdigit()
+                ]
+        else:
+            stored_keys = chunk_store.listdir(zarray.path)
+    except Exception as e:
+        print(f"Could not list the chunk keys of {zarray.path or 'the root array'}: {e}", file=sys.stderr)
+        return None
+
+    stored_chunks = []
+    for key in stored_keys:
+        indices = key.split(separator)
+        if len(indices) == zarray.ndim and all(i.isdigit() for i in indices):
+            chunk_index = tuple(int(i) for i in indices)
+            # Keys left over from a larger shape are outside the grid
+            if all(i < n for i, n in zip(chunk_index, zarray.cdata_shape)):
+                stored_chunks.append(chunk_index)
+    return sorted(stored_chunks)
@@ -0,0 +1,94 @@
+import asyncio
+import threading
+import time
+import numpy as np
+import pytest
+import requests
+import zarr
+
+from concurrent.futures import ThreadPoolExecutor
+from zarr.storage import FSStore
+
+from utils.chunk_server import ChunkServer
+from utils.volume_dataset import HttpVolumeDataset, ZarrVolumeDataset
+
+SHAPE = (40, 40, 40)  # Not a multiple of the chunks, so edge chunks are clipped
+CHUNKS = (16, 16, 16)
+
+class SlowZarrVolumeDataset(ZarrVolumeDataset):
+    """Delays every chunk read, so concurrent requests overlap while a chunk is decoded."""
+
+    def _read_region(self, region: tuple) -> np.ndarray:
+        time.sleep(0.2)
+        return super()._read_region(region)
+
+@pytest.fixture
+def source(tmp_path):
+    data = np.random.default_rng(0).integers(0, 60000, SHAPE, dtype=np.uint16)
+    zarr_path = str(tmp_path / "volume.zarr")
+    zarr.open_array(zarr_path, mode="w", shape=SHAPE, chunks=CHUNKS, dtype=np.uint16)[:] = data
+    return zarr_path, data
+
+@pytest.fixture
+def server(source):
+    """Runs a ChunkServer on a free port in a background event loop."""
+    zarr_path, _ = source
+    volumes = {"volume": ZarrVolumeDataset(zarr_path), "slow": SlowZarrVolumeDataset(zarr_path)}
+    chunk_server = ChunkServer(volumes, port=0, max_block_bytes=32 * 32 * 32 * 2)
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    asyncio.run_coroutine_threadsafe(chunk_server.start(), loop).result()
+    yield chunk_server, f"http://{chunk_server.host}:{chunk_server.port}"
+    asyncio.run_coroutine_threadsafe(chunk_server.stop(), loop).result()
+    asyncio.run_coroutine_threadsafe(close_connections(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+
+async def close_connections():
+    """Cancels the handlers of connections clients kept alive."""
+    tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+def test_http_blocks_match_source(source, server):
+    _, data = source
+    _, url = server
+    with HttpVolumeDataset(url, "volume") as volume:
+        assert volume.shape == SHAPE and volume.chunk_shape == CHUNKS and volume.dtype == np.uint16
+        assert np.array_equal(volume.get_block((5, 10, 15), (20, 20, 17)), data[5:25, 10:30, 15:32])
+        assert np.array_equal(volume.get_block((30, 30, 30), (16, 16, 16)), data[30:, 30:, 30:])
+        assert np.array_equal(volume.read_chunk((2, 2, 2)), data[32:, 32:, 32:])
+
+def test_zarr_store_reads_volume(source, server):
+    _, data = source
+    _, url = server
+    zarray = zarr.open_array(FSStore(f"{url}/volumes/volume", mode="r"), mode="r")
+    assert zarray.shape == SHAPE and zarray.chunks == CHUNKS
+    assert np.array_equal(zarray[:], data)
+
+def test_error_responses(server):
+    _, url = server
+    assert requests.get(f"{url}/volumes/missing/metadata").status_code == 404
+    # Chunk keys outside the 3 x 3 x 3 chunk grid are never decoded
+    assert requests.get(f"{url}/volumes/volume/3.0.0").status_code == 404
+    assert requests.get(f"{url}/volumes/volume/0.-1.0").status_code == 404
+    assert requests.get(f"{url}/volumes/volume/0.0").status_code == 400
+    assert requests.get(f"{url}/volumes/volume/block", params={"start": "0,0,0"}).status_code == 400
+    assert requests.get(f"{url}/volumes/volume/block", params={"start": "0,0,99", "size": "1,1,1"}).status_code == 400
+    assert requests.get(f"{url}/volumes/volume/block", params={"start": "0,0,0", "size": "40,40,40"}).status_code == 413
+    assert requests.post(f"{url}/volumes").status_code == 405
+
+def test_concurrent_requests_share_one_decode(source, server):
+    _, data = source
+    chunk_server, url = server
+
+    def fetch_chunk(_):
+        return requests.get(f"{url}/volumes/slow/1.1.1").content
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        bodies = list(executor.map(fetch_chunk, range(8)))
+    assert all(np.array_equal(np.frombuffer(b, dtype=np.uint16).reshape(CHUNKS), data[16:32, 16:32, 16:32]) for b in bodies)
+    assert chunk_server.cache.misses == 1 and chunk_server.cache.hits == 0
@@ -0,0 +1,126 @@
+import glob
+import json
+import os
+import struct
+import numpy as np
+import pytest
+
+from utils.dm3_header import memmap_dm3_image, read_dm3_header
+from utils.metadata import extract_dm3_metadata
+
+COMMITTED_METADATA = sorted(glob.glob(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                                   "outputs", "empiar_11759_metadata", "*.json")))
+
+class Dm3Writer:
+    """Writes a minimal DM3 tag tree. Groups are lists of (label, entry) pairs, with None labels
+    for unlabeled entries; leaves are (encoded type, value) tuples, with numpy arrays for array tags."""
+
+    SIMPLE_FORMATS = {3: "i", 4: "H", 6: "f", 7: "d", 8: "?", 10: "B"}
+    ARRAY_TYPES = {np.dtype("u1"): 10, np.dtype("u2"): 4, np.dtype("f4"): 6, np.dtype("i4"): 3}
+
+    def __init__(self, byte_order: str):
+        self.byte_order = byte_order
+        self.body = bytearray()
+
+    def write(self, file_path: str, root: list) -> None:
+        self._group(root)
+        header = struct.pack(">iii", 3, len(self.body) + 16, 1 if self.byte_order == "<" else 0)
+        with open(file_path, "wb") as file:
+            file.write(header + self.body + b"\0" * 8)
+
+    def _group(self, group: list) -> None:
+        self.body += struct.pack(">BBi", 0, 0, len(group))
+        for label, entry in group:
+            label_bytes = label.encode("latin-1") if label is not None else b""
+            is_group = isinstance(entry, list)
+            self.body += struct.pack(">BH", 20 if is_group else 21, len(label_bytes)) + label_bytes
+            if is_group:
+                self._group(entry)
+            else:
+                self._data(*entry)
+
+    def _data(self, encoded_type: int, value: object) -> None:
+        self.body += b"%%%%"
+        if encoded_type == 20:
+            array = np.asarray(value)
+            self.body += struct.pack(">iiii", 3, 20, self.ARRAY_TYPES[array.dtype.newbyteorder("=")], array.size)
+            self.body += array.astype(array.dtype.newbyteorder(self.byte_order)).tobytes()
+        elif encoded_type == 18:
+            encoded = value.encode("utf-16-le" if self.byte_order == "<" else "utf-16-be")
+            self.body += struct.pack(">iii", 2, 18, len(encoded)) + encoded
+        else:
+            self.body += struct.pack(">ii", 1, encoded_type)
+            self.body += struct.pack(self.byte_order + self.SIMPLE_FORMATS[encoded_type], value)
+
+def text(value: str) -> tuple:
+    """A short USHORT array tag, which DM3 readers decode as a string."""
+    return 20, np.frombuffer(value.encode("utf-16-le"), dtype="<u2").astype(np.uint16)
+
+def write_dm3(file_path: str, image: np.ndarray, data_type: int, byte_order: str = "<") -> None:
+    """Writes a DM3 file holding an RGBA thumbnail and a calibrated main image, like a DigiScan acquisition."""
+    thumbnail = np.zeros((4, 4, 4), dtype=np.uint8)
+    Dm3Writer(byte_order).write(file_path, [
+        ("DocumentObjectList", [(None, [("ImageDisplayInfo", [("LowLimit", (6, 65.0)), ("HighLimit", (6, 123.0))])])]),
+        ("ImageList", [
+            (None, [
+                ("ImageData", [
+                    ("Calibrations", [("Dimension", [(None, [("Scale", (6, 1.0)), ("Units", text(""))])])]),
+                    ("Data", (20, thumbnail.ravel())),
+                    ("DataType", (3, 23)),
+                    ("Dimensions", [(None, (3, 4)), (None, (3, 4))]),
+                ]),
+                ("ImageTags", [("GMS Version", [("Created", text("3.21.1374.0"))])]),
+            ]),
+            (None, [
+                ("ImageData", [
+                    ("Calibrations", [("Dimension", [(None, [("Scale", (6, 0.008)), ("Units", text("µm"))])])]),
+                    ("Data", (20, image.ravel())),
+                    ("DataType", (3, data_type)),
+                    ("Dimensions", [(None, (3, image.shape[1])), (None, (3, image.shape[0]))]),
+                ]),
+                ("ImageTags", [
+                    ("DataBar", [("Acquisition Date", text("11.06.2018"))]),
+                    ("Microscope Info", [("Voltage", (6, 1900.0)), ("Name", text("FEI Quanta"))]),
+                ]),
+            ]),
+        ]),
+    ])
+
+@pytest.mark.parametrize("byte_order", ["<", ">"])
+def test_main_image_round_trips(tmp_path, byte_order):
+    file_path = str(tmp_path / "slice.dm3")
+    image = np.arange(6 * 5, dtype=np.uint16).reshape(5, 6) * 1000
+    write_dm3(file_path, image, data_type=10, byte_order=byte_order)
+
+    metadata = read_dm3_header(file_path)
+    assert metadata["image_summary"] == {"size": [6, 5], "dtype": "UNSIGNED_INT16_DATA",
+                                         "pixel_size_value": pytest.approx(0.008), "pixel_size_unit": "micron",
+                                         "cuts": [65, 123]}
+    # Pixels are stored in the byte order of the file header
+    assert np.dtype(metadata["pixel_data"]["dtype"]) == np.dtype(f"{byte_order}u2")
+    assert np.array_equal(memmap_dm3_image(file_path), image)
+    assert np.array_equal(memmap_dm3_image(file_path, metadata["pixel_data"]), image)
+
+@pytest.mark.skipif(not COMMITTED_METADATA, reason="No committed EMPIAR 11759 metadata")
+def test_saved_metadata_matches_committed_layout(tmp_path):
+    file_path = str(tmp_path / "slice.dm3")
+    write_dm3(file_path, np.full((5, 6), 100, dtype=np.uint8), data_type=6)
+    extract_dm3_metadata(file_path, str(tmp_path / "metadata"))
+    with open(tmp_path / "metadata" / "slice_dm3_metadata.json", encoding="utf-8") as metadata_file:
+        metadata = json.load(metadata_file)
+
+    for committed_path in COMMITTED_METADATA:
+        with open(committed_path, encoding="utf-8") as committed_file:
+            committed = json.load(committed_file)
+        assert set(metadata) - {"pixel_data"} == set(committed)
+        assert metadata["file_version"] == committed["file_version"]
+        assert set(metadata["image_summary"]) == set(committed["image_summary"])
+        for key, value in metadata["image_summary"].items():
+            assert type(value) is type(committed["image_summary"][key])
+        assert metadata["image_summary"]["dtype"] == committed["image_summary"]["dtype"]
+        assert metadata["image_summary"]["pixel_size_unit"] == committed["image_summary"]["pixel_size_unit"]
+        assert all(isinstance(cut, int) for cut in committed["image_summary"]["cuts"] + metadata["image_summary"]["cuts"])
+        assert set(metadata["info"]) <= set(committed["info"])
+        # Tags are named alike: the written tags of the main image appear in every committed file
+        assert not [tag for tag in metadata["full_original_tags"] if tag not in committed["full_original_tags"]]
+        assert all(isinstance(v, str) for v in metadata["full_original_tags"].values())
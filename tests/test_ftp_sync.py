@@ -0,0 +1,74 @@
+import ftplib
+import json
+import os
+import pytest
+
+from utils import ftp_sync
+from utils.ftp_sync import crawl_ftp_tree, sync_ftp_directory
+
+REMOTE_TREE = {
+    "/data": [("a.tif", {"type": "file", "size": 4, "modify": "20240101000000"}),
+              ("sub", {"type": "dir", "size": 0, "modify": "20240101000000"})],
+    "/data/sub": [("b.tif", {"type": "file", "size": 8, "modify": "20240101000000"})],
+}
+
+class FakePool:
+    """Stands in for FtpConnectionPool, listing REMOTE_TREE except for the unreachable paths."""
+
+    max_connections = 2
+
+    def __init__(self, host, max_connections=2, port=21, unreachable=()):
+        self.unreachable = unreachable
+        self.downloaded = []
+
+    def list_directory(self, remote_path):
+        if remote_path in self.unreachable:
+            raise ConnectionRefusedError(f"Cannot reach {remote_path}")
+        return REMOTE_TREE[remote_path]
+
+    def download(self, remote_file, local_file):
+        self.downloaded.append(remote_file)
+
+    def close(self):
+        pass
+
+def test_crawl_keeps_cached_entries_of_failed_subdirectories():
+    cached_listing = {"sub/b.tif": {"size": 8, "modify": "20230101000000"}, "other/c.tif": {"size": 1, "modify": None}}
+    remote_files = crawl_ftp_tree(FakePool(None, unreachable=("/data/sub",)), "/data", cached_listing=cached_listing)
+    assert remote_files == {"a.tif": {"size": 4, "modify": "20240101000000"},
+                            "sub/b.tif": {"size": 8, "modify": "20230101000000"}}
+
+def test_unreachable_root_keeps_cached_listing(tmp_path, monkeypatch):
+    listing_path = str(tmp_path / "listing.json")
+    cached = {"host": "host", "remote_path": "/data", "files": {"a.tif": {"size": 4, "modify": "20240101000000"}}}
+    with open(listing_path, "w", encoding="utf-8") as listing_file:
+        json.dump(cached, listing_file)
+    monkeypatch.setattr(ftp_sync, "FtpConnectionPool", lambda *args: FakePool(*args, unreachable=("/data",)))
+
+    with pytest.raises(ftplib.all_errors):
+        sync_ftp_directory("host", "/data", str(tmp_path / "save"), listing_path)
+    with open(listing_path, "r", encoding="utf-8") as listing_file:
+        assert json.load(listing_file) == cached
+
+def test_list_dates_only_compare_sizes(tmp_path, monkeypatch):
+    save_path = tmp_path / "save"
+    os.makedirs(save_path / "sub")
+    (save_path / "a.tif").write_bytes(b"0" * 4)
+    (save_path / "sub" / "b.tif").write_bytes(b"0" * 8)
+    listing_path = str(tmp_path / "listing.json")
+    with open(listing_path, "w", encoding="utf-8") as listing_file:
+        # Listed with LIST while the files were recent, then with MLSD (or LIST after six months)
+        json.dump({"files": {"a.tif": {"size": 4, "modify": "Jan 01 12:00"},
+                             "sub/b.tif": {"size": 8, "modify": "20230101000000"}}}, listing_file)
+    pool = FakePool(None)
+    monkeypatch.setattr(ftp_sync, "FtpConnectionPool", lambda *args: pool)
+
+    sync_ftp_directory("host", "/data", str(save_path), listing_path)
+    assert pool.downloaded == ["/data/sub/b.tif"]
+
+def test_parse_list_line():
+    assert ftp_sync._parse_list_line("-rw-r--r-- 1 ftp ftp 1024 Jan 01 2023 a b.tif") == \
+        ("a b.tif", {"type": "file", "size": 1024, "modify": "Jan 01 2023"})
+    assert ftp_sync._parse_list_line("lrwxrwxrwx 1 ftp ftp 6 Jan 01 12:00 latest -> 2024") == \
+        ("latest", {"type": "link", "size": 6, "modify": "Jan 01 12:00"})
+    assert ftp_sync._parse_list_line("total 8") is None
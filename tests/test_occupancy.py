@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+import zarr
+
+from utils.occupancy import build_occupancy_index
+from utils.volume_dataset import ZarrVolumeDataset
+
+SHAPE = (32, 32, 32)
+CHUNKS = (16, 16, 16)
+
+def write_volume(path, dimension_separator=".", shape=SHAPE):
+    """Writes a label volume whose first z-slab of chunks holds labels and the rest is never stored."""
+    zarray = zarr.open_array(path, mode="w", shape=shape, chunks=CHUNKS, dtype=np.uint64,
+                             fill_value=0, dimension_separator=dimension_separator)
+    labels = np.zeros((16,) + shape[1:], dtype=np.uint64)
+    labels[:8, :8, :8] = 7
+    labels[:, 16:, 16:] = 9
+    zarray[:16] = labels
+    return str(path)
+
+@pytest.mark.parametrize("dimension_separator", [".", "/"])
+def test_stored_chunks_skip_unwritten_chunks(tmp_path, dimension_separator):
+    volume = ZarrVolumeDataset(write_volume(tmp_path / "labels.zarr", dimension_separator))
+    assert volume.stored_chunks() == [(0, i, j) for i in range(2) for j in range(2)]
+
+def test_index_marks_empty_chunks_and_labels(tmp_path):
+    volume = ZarrVolumeDataset(write_volume(tmp_path / "labels.zarr"))
+    occupancy_index = build_occupancy_index(volume, str(tmp_path / "occupancy.npz"))
+
+    assert occupancy_index.nonempty_chunks() == [(0, 0, 0), (0, 1, 1)]
+    assert occupancy_index.foreground_fraction[0, 0, 0] == pytest.approx(1 / 8)
+    assert occupancy_index.labels_in_chunk((0, 1, 1)).tolist() == [9]
+    assert occupancy_index.chunks_with_label(7) == [(0, 0, 0)]
+
+def test_index_of_another_shape_is_rebuilt(tmp_path):
+    index_path = str(tmp_path / "occupancy.npz")
+    build_occupancy_index(ZarrVolumeDataset(write_volume(tmp_path / "old.zarr", shape=(16, 32, 32))), index_path)
+
+    # The volume was downloaded again with a larger shape: the old index would index out of its grid
+    occupancy_index = build_occupancy_index(ZarrVolumeDataset(write_volume(tmp_path / "new.zarr")), index_path)
+    assert occupancy_index.shape == SHAPE and occupancy_index.grid_shape == (2, 2, 2)
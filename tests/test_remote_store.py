@@ -0,0 +1,145 @@
+import os
+import sys
+import types
+import numpy as np
+import pytest
+import zarr
+
+from utils import remote_store
+from utils.remote_store import DiskCachedStore, PrecomputedVolumeDataset, evict_disk_cache, open_remote_zarr
+
+SHAPE = (64, 64, 64)
+CHUNKS = (16, 16, 16)
+CHUNK_BYTES = 16 * 16 * 16 * 2  # Uncompressed uint16 chunks
+
+@pytest.fixture
+def remote_volume(tmp_path):
+    """A local Zarr array standing in for the remote container. The last z-slab of chunks
+    is left unwritten, so those keys are missing from the store."""
+    data = np.random.default_rng(0).integers(0, 60000, SHAPE, dtype=np.uint16)
+    data[48:] = 0
+    remote_path = str(tmp_path / "remote.zarr")
+    zarray = zarr.open_array(remote_path, mode="w", shape=SHAPE, chunks=CHUNKS, dtype=np.uint16,
+                             compressor=None, fill_value=0)
+    zarray[:48] = data[:48]
+    return remote_path, data
+
+def cache_size(cache_path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(cache_path) for name in files)
+
+def test_blocks_match_remote_data(remote_volume, tmp_path):
+    remote_path, data = remote_volume
+    volume = open_remote_zarr(remote_path, str(tmp_path / "cache"))
+
+    block = volume.get_block((10, 20, 30), (40, 30, 20))
+    assert np.array_equal(block, data[10:50, 20:50, 30:50])
+    # Blocks spanning missing chunks come back as the fill value
+    assert np.array_equal(volume.get_block((40, 0, 0), (24, 64, 64)), data[40:64])
+
+def test_cache_hits_do_not_call_remote_store(remote_volume, tmp_path, monkeypatch):
+    remote_path, data = remote_volume
+    volume = open_remote_zarr(remote_path, str(tmp_path / "cache"))
+    store = volume.zarray.chunk_store
+    assert isinstance(store, DiskCachedStore)
+
+    hits, misses = store.hits, store.misses  # Opening reads the .zarray metadata through the cache
+    first = volume.get_block((0, 0, 0), (32, 32, 32))
+    assert store.misses - misses == 8 and store.hits == hits
+
+    def fail(*args, **kwargs):
+        raise AssertionError("The remote store was called for cached chunks.")
+    monkeypatch.setattr(store.remote_store, "getitems", fail)
+    monkeypatch.setattr(store.remote_store, "__getitem__", fail, raising=False)
+
+    second = volume.get_block((0, 0, 0), (32, 32, 32))
+    assert np.array_equal(first, second) and np.array_equal(second, data[:32, :32, :32])
+    assert store.hits - hits == 8 and store.misses - misses == 8
+
+def test_cache_is_reused_across_opens(remote_volume, tmp_path):
+    remote_path, data = remote_volume
+    open_remote_zarr(remote_path, str(tmp_path / "cache")).get_block((0, 0, 0), (16, 16, 16))
+
+    volume = open_remote_zarr(remote_path, str(tmp_path / "cache"))
+    volume.get_block((0, 0, 0), (16, 16, 16))
+    # Both the .zarray metadata and the chunk come from the cache of the first open
+    assert volume.zarray.chunk_store.hits == 2 and volume.zarray.chunk_store.misses == 0
+
+def test_eviction_keeps_cache_under_max_bytes(remote_volume, tmp_path):
+    remote_path, data = remote_volume
+    cache_path = str(tmp_path / "cache")
+    max_bytes = 10 * CHUNK_BYTES
+    volume = open_remote_zarr(remote_path, cache_path, max_bytes=max_bytes)
+
+    for z in range(0, SHAPE[0], CHUNKS[0]):
+        assert np.array_equal(volume.get_block((z, 0, 0), (16, 64, 64)), data[z:z + 16])
+        assert cache_size(cache_path) <= max_bytes
+        assert volume.zarray.chunk_store.current_bytes == cache_size(cache_path)
+
+def test_evict_disk_cache_removes_oldest_files_first(tmp_path):
+    for i in range(10):
+        file_path = tmp_path / f"chunk_{i}"
+        file_path.write_bytes(b"\0" * 100)
+        os.utime(file_path, (i, i))
+
+    remaining = evict_disk_cache(str(tmp_path), 500)
+    assert remaining == cache_size(tmp_path) <= 500 * 0.9
+    assert sorted(os.listdir(tmp_path)) == [f"chunk_{i}" for i in range(6, 10)]
+
+def test_remote_errors_are_raised_and_not_cached_as_missing(remote_volume, tmp_path, monkeypatch):
+    remote_path, data = remote_volume
+    volume = open_remote_zarr(remote_path, str(tmp_path / "cache"))
+    store = volume.zarray.chunk_store
+    remote_getitems = store.remote_store.map.getitems
+
+    monkeypatch.setattr(store.remote_store.map, "getitems",
+                        lambda keys, on_error: {key: TimeoutError("read timed out") for key in keys})
+    with pytest.raises(TimeoutError):
+        volume.get_block((0, 0, 0), (16, 16, 16))
+    assert not store._missing_keys
+
+    # Once the remote store recovers the data is read, while really missing chunks read as fill values
+    monkeypatch.setattr(store.remote_store.map, "getitems", remote_getitems)
+    assert np.array_equal(volume.get_block((0, 0, 0), (16, 16, 16)), data[:16, :16, :16])
+    assert np.array_equal(volume.get_block((48, 0, 0), (16, 16, 16)), data[48:, :16, :16])
+    assert store._missing_keys == {"3.0.0"}
+
+class FakeCloudVolume:
+    """Stands in for CloudVolume: each read writes one 1 KiB file to the cache directory,
+    as downloading a compressed chunk would, whatever the size of the block read."""
+
+    def __init__(self, cloudpath, mip, cache, fill_missing, progress):
+        self.cache = cache
+        self.voxel_offset, self.shape, self.dtype = (0, 0, 0), (64, 64, 64, 1), "uint64"
+        self.chunk_size, self.num_channels = (16, 16, 16), 1
+        self.reads = 0
+
+    def __getitem__(self, slices):
+        self.reads += 1
+        os.makedirs(self.cache, exist_ok=True)
+        with open(os.path.join(self.cache, f"chunk_{self.reads}"), "wb") as chunk_file:
+            chunk_file.write(b"\0" * 1024)
+        return np.zeros(tuple(s.stop - s.start for s in slices), dtype=np.uint64)
+
+def test_precomputed_cache_is_measured_and_trimmed(tmp_path, monkeypatch):
+    monkeypatch.setitem(sys.modules, "cloudvolume", types.SimpleNamespace(CloudVolume=FakeCloudVolume))
+    monkeypatch.setattr(remote_store, "CACHE_CHECK_SECONDS", 0)
+    cache_path = str(tmp_path / "cache")
+    volume = PrecomputedVolumeDataset("gs://bucket/volume", cache_path, max_bytes=4 * 1024)
+
+    for _ in range(12):
+        # A one-voxel uint64 read decodes to 8 bytes but downloads a whole chunk file
+        assert volume.get_block((0, 0, 0, 0), (1, 1, 1, 1)).nbytes == 8
+        assert cache_size(cache_path) <= 4 * 1024
+        assert volume.current_bytes == cache_size(cache_path)
+
+def test_precomputed_cache_is_measured_on_a_schedule(tmp_path, monkeypatch):
+    monkeypatch.setitem(sys.modules, "cloudvolume", types.SimpleNamespace(CloudVolume=FakeCloudVolume))
+    volume = PrecomputedVolumeDataset("gs://bucket/volume", str(tmp_path / "cache"), max_bytes=4 * 1024)
+
+    walks = []
+    monkeypatch.setattr(remote_store, "evict_disk_cache", lambda *args: walks.append(args) or 0)
+    volume.get_block((0, 0, 0, 0), (1, 1, 1, 1))
+    assert not walks  # Checked less than CACHE_CHECK_SECONDS ago, when opened
+    volume._last_cache_check -= remote_store.CACHE_CHECK_SECONDS
+    volume.get_block((0, 0, 0, 0), (1, 1, 1, 1))
+    assert len(walks) == 1
@@ -0,0 +1,56 @@
+import os
+import numpy as np
+import pytest
+import tifffile
+
+from utils.tiff_index import TiffPageIndex, scan_tiff_pages
+from utils.volume_dataset import TiffVolumeDataset
+
+SHAPE = (50, 32, 32)
+
+@pytest.fixture
+def stack():
+    return np.random.default_rng(0).integers(0, 60000, SHAPE, dtype=np.uint16)
+
+def test_strip_stack_is_read_directly(stack, tmp_path):
+    file_path = str(tmp_path / "strips.tif")
+    tifffile.imwrite(file_path, stack, rowsperstrip=4)
+
+    with TiffVolumeDataset(file_path) as volume:
+        assert volume.page_index is not None
+        assert np.array_equal(volume.get_block((3, 5, 7), (20, 16, 16)), stack[3:23, 5:21, 7:23])
+        assert np.array_equal(volume.get_block((0, 0, 0), SHAPE), tifffile.imread(file_path))
+
+def test_tiled_stack_is_decoded_by_tifffile(stack, tmp_path):
+    file_path = str(tmp_path / "tiles.tif")
+    tifffile.imwrite(file_path, stack, tile=(16, 16))
+
+    with TiffVolumeDataset(file_path) as volume:
+        # Tiles hold 16 x 16 pieces of a page, not rows, so direct reads would scramble them
+        assert volume.page_index is None
+        assert np.array_equal(volume.get_block((0, 0, 0), SHAPE), tifffile.imread(file_path))
+        assert np.array_equal(volume.get_block((10, 8, 8), (5, 16, 16)), stack[10:15, 8:24, 8:24])
+
+def test_saved_index_is_reused(stack, tmp_path, monkeypatch):
+    file_path = str(tmp_path / "strips.tif")
+    index_path = str(tmp_path / "index" / "strips_pages.npz")
+    tifffile.imwrite(file_path, stack)
+
+    page_index = scan_tiff_pages(file_path, index_path)
+    assert os.path.exists(index_path)
+    assert page_index.page_count == SHAPE[0]
+
+    # A second open loads the index instead of walking the IFDs again
+    monkeypatch.setattr("utils.tiff_index._walk_ifd_chain", lambda *args: pytest.fail("index was rescanned"))
+    with TiffVolumeDataset(file_path, index_path) as volume:
+        assert np.array_equal(volume.page_index.data_offsets, page_index.data_offsets)
+        assert np.array_equal(volume.get_block((0, 0, 0), SHAPE), stack)
+
+def test_save_to_bare_filename(stack, tmp_path, monkeypatch):
+    file_path = str(tmp_path / "strips.tif")
+    tifffile.imwrite(file_path, stack)
+    monkeypatch.chdir(tmp_path)
+
+    scan_tiff_pages(file_path).save("pages.npz")
+    loaded = TiffPageIndex.load("pages.npz")
+    assert loaded.page_count == SHAPE[0]